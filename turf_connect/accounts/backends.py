@@ -0,0 +1,79 @@
+"""Authentication backend that serves logged-in users from the cache.
+
+``AuthenticationMiddleware`` resolves ``request.user`` on every request.
+``CachedModelBackend.get_user`` answers that from a compact snapshot of the
+user row kept in the default cache, so role checks and page headers cost no
+query. The snapshot holds no password hash, only the session auth hash
+Django checks the session against (an HMAC of it). It is dropped whenever
+the user is saved or deleted (``accounts.signals``); fields outside it load
+lazily from the database.
+
+Dropping the snapshot only reaches other workers through a shared cache
+(``CACHE_URL``). With the per-process default, snapshots live for
+``LOCAL_SNAPSHOT_TIMEOUT`` seconds, so a deactivated user, a changed role or
+an old password stops working everywhere within that time.
+
+Password checks are capped by ``accounts.hashing``.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import router
+
+from bmt.caching import is_shared
+
+from .hashing import burn_hash, verify_user_password
+
+SNAPSHOT_FIELDS = ('id', 'username', 'email', 'role')
+SNAPSHOT_TIMEOUT = 5 * 60
+LOCAL_SNAPSHOT_TIMEOUT = 30
+
+
+def snapshot_key(user_id):
+    return f'accounts:user:v2:{user_id}'
+
+
+def snapshot_timeout():
+    return SNAPSHOT_TIMEOUT if is_shared() else LOCAL_SNAPSHOT_TIMEOUT
+
+
+def invalidate_snapshot(user_id):
+    cache.delete(snapshot_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        User = get_user_model()
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            burn_hash(password)
+            return None
+        if verify_user_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+    def get_user(self, user_id):
+        User = get_user_model()
+        # from_db() expects values in model field order
+        field_names = [f.attname for f in User._meta.concrete_fields if f.attname in SNAPSHOT_FIELDS]
+        key = snapshot_key(user_id)
+        snapshot = cache.get(key)
+        if snapshot is None:
+            user = User._default_manager.filter(pk=user_id).first()
+            if user is None or not self.user_can_authenticate(user):
+                return None
+            values = [getattr(user, name) for name in field_names]
+            cache.set(key, (values, user.get_session_auth_hash()), snapshot_timeout())
+            return user
+        values, session_auth_hash = snapshot
+        user = User.from_db(router.db_for_read(User), field_names, values)
+        # Only users who may authenticate are snapshotted
+        user.is_active = True
+        user.cache_session_auth_hash(session_auth_hash)
+        return user
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 with the work factor taken from
+    ``settings.PASSWORD_PBKDF2_ITERATIONS``, never below Django's default.
+
+    It keeps the ``pbkdf2_sha256`` algorithm name, so existing hashes verify
+    unchanged and are rehashed at the configured cost on the next login.
+    """
+
+    @property
+    def iterations(self):
+        default = PBKDF2PasswordHasher.iterations
+        return max(getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', default), default)
@@ -0,0 +1,84 @@
+"""A concurrency cap on password hashing.
+
+Password hashes are deliberately slow. ``run_hash`` lets at most
+``settings.PASSWORD_HASH_WORKERS`` of them run at once per process, on the
+calling thread; a login that cannot start within
+``settings.PASSWORD_HASH_QUEUE_TIMEOUT`` seconds fails fast with
+``HashingBusy`` instead of piling more CPU work onto the ones running.
+
+After a successful check, a password stored with an old algorithm or cost
+is rehashed with the preferred hasher. Every check sends ``password_checked``
+with the time spent, for tuning the cost against a latency budget.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, identify_hasher, make_password
+from django.dispatch import Signal
+
+# sender: the hasher algorithm; kwargs: user, seconds, success, rehashed
+password_checked = Signal()
+
+_slots = None
+_slots_lock = threading.Lock()
+
+
+class HashingBusy(Exception):
+    """Raised when no hashing slot frees up in time."""
+
+
+def _get_slots():
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(getattr(settings, 'PASSWORD_HASH_WORKERS', 4))
+    return _slots
+
+
+def run_hash(func, *args):
+    """Run a hashing function once one of the hashing slots is free."""
+    slots = _get_slots()
+    if not slots.acquire(timeout=getattr(settings, 'PASSWORD_HASH_QUEUE_TIMEOUT', 2.0)):
+        raise HashingBusy()
+    try:
+        return func(*args)
+    finally:
+        slots.release()
+
+
+def needs_rehash(encoded):
+    preferred = get_hasher('default')
+    try:
+        hasher = identify_hasher(encoded)
+    except ValueError:
+        return False
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def verify_user_password(user, raw_password):
+    """Check ``raw_password`` against ``user`` and upgrade its stored hash."""
+    started = time.perf_counter()
+    success = run_hash(check_password, raw_password, user.password)
+    rehashed = False
+    if success and needs_rehash(user.password):
+        user.password = run_hash(make_password, raw_password)
+        user.save(update_fields=['password'])
+        rehashed = True
+    try:
+        algorithm = identify_hasher(user.password).algorithm
+    except ValueError:
+        algorithm = 'unknown'
+    password_checked.send(
+        sender=algorithm,
+        user=user,
+        seconds=time.perf_counter() - started,
+        success=success,
+        rehashed=rehashed,
+    )
+    return success
+
+
+def burn_hash(raw_password):
+    """Hash once for an unknown user so lookups can't be told apart by timing."""
+    run_hash(make_password, raw_password)
@@ -23,3 +23,15 @@ class User(AbstractUser):
 
     def __str__(self):
         return f"{self.email} ({self.get_role_display()})"
+
+    def cache_session_auth_hash(self, session_auth_hash):
+        """Answer ``get_session_auth_hash`` without loading the password, for
+        users rebuilt from ``accounts.backends``' snapshot."""
+        self._session_auth_hash = session_auth_hash
+
+    def get_session_auth_hash(self):
+        return getattr(self, '_session_auth_hash', None) or super().get_session_auth_hash()
+
+    def set_password(self, raw_password):
+        self._session_auth_hash = None
+        super().set_password(raw_password)
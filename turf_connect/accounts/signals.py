@@ -0,0 +1,28 @@
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import invalidate_snapshot
+from .hashing import password_checked
+
+logger = logging.getLogger('accounts.hashing')
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def drop_user_snapshot(sender, instance, **kwargs):
+    invalidate_snapshot(instance.pk)
+
+
+@receiver(password_checked)
+def report_hash_time(sender, user, seconds, success, rehashed, **kwargs):
+    millis = seconds * 1000
+    budget = getattr(settings, 'PASSWORD_HASH_BUDGET_MS', None)
+    level = logging.WARNING if budget and millis > budget else logging.DEBUG
+    logger.log(
+        level, "password check for user %s: %s in %.0f ms (success=%s, rehashed=%s)",
+        user.pk, sender, millis, success, rehashed,
+    )
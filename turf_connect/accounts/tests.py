@@ -1,3 +1,110 @@
-from django.test import TestCase
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import SESSION_KEY
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from . import hashing
+from .backends import (
+    LOCAL_SNAPSHOT_TIMEOUT, SNAPSHOT_TIMEOUT, CachedModelBackend, snapshot_key, snapshot_timeout,
+)
+from .hashers import TunedPBKDF2PasswordHasher
+from .hashing import HashingBusy, run_hash
+from .models import User
+
+
+class HashingCapTests(TestCase):
+
+    def setUp(self):
+        hashing._slots = None
+        self.addCleanup(setattr, hashing, '_slots', None)
+
+    @override_settings(PASSWORD_HASH_WORKERS=1, PASSWORD_HASH_QUEUE_TIMEOUT=0.05)
+    def test_busy_when_every_slot_is_taken(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_hash():
+            started.set()
+            release.wait(5)
+
+        worker = threading.Thread(target=run_hash, args=(slow_hash,))
+        worker.start()
+        started.wait(5)
+        try:
+            with self.assertRaises(HashingBusy):
+                run_hash(str, 'password')
+        finally:
+            release.set()
+            worker.join()
+        self.assertEqual(run_hash(str, 'password'), 'password')
+
+    def test_admin_login_answers_busy_with_503(self):
+        with mock.patch('accounts.backends.burn_hash', side_effect=HashingBusy):
+            response = self.client.post('/admin/login/', {'username': 'a@example.com', 'password': 'x'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class TunedPBKDF2PasswordHasherTests(TestCase):
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+    def test_never_below_the_django_default(self):
+        self.assertEqual(TunedPBKDF2PasswordHasher().iterations, PBKDF2PasswordHasher.iterations)
+
+    @override_settings(PASSWORD_PBKDF2_ITERATIONS=PBKDF2PasswordHasher.iterations * 2)
+    def test_configured_cost(self):
+        self.assertEqual(TunedPBKDF2PasswordHasher().iterations, PBKDF2PasswordHasher.iterations * 2)
+
+
+class UserSnapshotTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='player', email='player@example.com', password=None, phone_number='8888888888',
+        )
+        self.client.force_login(self.user)
+
+    def test_snapshot_holds_no_password(self):
+        CachedModelBackend().get_user(self.user.pk)
+        values, session_auth_hash = cache.get(snapshot_key(self.user.pk))
+        self.assertNotIn(self.user.password, values)
+        self.assertEqual(session_auth_hash, self.user.get_session_auth_hash())
+
+    def test_cached_user_keeps_the_session(self):
+        self.client.get('/')
+        with self.assertNumQueries(0):
+            user = CachedModelBackend().get_user(self.user.pk)
+        self.assertEqual(user.get_session_auth_hash(), self.user.get_session_auth_hash())
+        self.client.get('/')
+        self.assertEqual(int(self.client.session[SESSION_KEY]), self.user.pk)
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.get('/')
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password('a new password')
+        user.save()
+        self.client.get('/')
+        self.assertNotIn(SESSION_KEY, self.client.session)
+
+    def test_inactive_users_are_not_served(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(CachedModelBackend().get_user(self.user.pk))
+        self.assertIsNone(cache.get(snapshot_key(self.user.pk)))
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/')
+        self.assertIsNotNone(cache.get(snapshot_key(self.user.pk)))
+        user = User.objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+        self.assertIsNone(CachedModelBackend().get_user(self.user.pk))
+        response = self.client.get('/')
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_short_lived_in_a_per_process_cache(self):
+        self.assertEqual(snapshot_timeout(), LOCAL_SNAPSHOT_TIMEOUT)
+        with mock.patch('accounts.backends.is_shared', return_value=True):
+            self.assertEqual(snapshot_timeout(), SNAPSHOT_TIMEOUT)
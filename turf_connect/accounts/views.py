@@ -4,18 +4,25 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.http import require_POST
 
+from bmt.ratelimit import rate_limit
+from .hashing import HashingBusy
 from .forms import PlayerRegistrationForm, OwnerRegistrationForm
 
 User = get_user_model()
 
 
+@rate_limit('login', ip='20/m', email='5/m')
 def login_view(request):
     """Authenticate user by email and redirect based on role."""
     if request.method == 'POST':
         email = request.POST.get('email', '').strip()
         password = request.POST.get('password', '')
 
-        user = authenticate(request, username=email, password=password)
+        try:
+            user = authenticate(request, username=email, password=password)
+        except HashingBusy:
+            messages.error(request, 'Too many sign-ins right now. Please try again in a moment.')
+            return render(request, 'playerlogin.html')
 
         if user is not None:
             login(request, user)
@@ -61,13 +68,18 @@ def register_owner(request):
     return render(request, 'ownerregistration.html', {'form': form})
 
 
+@rate_limit('admin_login', ip='10/m', email='5/m')
 def admin_login(request):
     """Separate login page for admin users."""
     if request.method == 'POST':
         email = request.POST.get('email', '').strip()
         password = request.POST.get('password', '')
 
-        user = authenticate(request, username=email, password=password)
+        try:
+            user = authenticate(request, username=email, password=password)
+        except HashingBusy:
+            messages.error(request, 'Too many sign-ins right now. Please try again in a moment.')
+            return render(request, 'adminlogin.html')
 
         if user is not None and user.role == 'admin':
             login(request, user)
@@ -0,0 +1,68 @@
+"""Weekday x hour occupancy and revenue heatmaps for owners.
+
+A turf's slot history (live and archived) is loaded as NumPy columns with a
+single ``values_list`` query and folded into 7x24 matrices with
+``np.bincount``. Results are cached per turf per day.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from turfs.models import ArchivedSlot, Slot
+from .caching import cached
+
+HEATMAP_DAYS = 365
+HEATMAP_CACHE_TIMEOUT = 60 * 60
+CELLS = 7 * 24
+
+
+def load_slot_columns(turf_id, start, end):
+    """Return ``(date_ord, start_min, booked, price)`` arrays for a turf."""
+    fields = ('date', 'start_time', 'status', 'price')
+    live = Slot.objects.filter(turf_id=turf_id, date__gte=start, date__lte=end).values_list(*fields)
+    archived = ArchivedSlot.objects.filter(turf_id=turf_id, date__gte=start, date__lte=end).values_list(*fields)
+    rows = list(live.union(archived, all=True))
+
+    count = len(rows)
+    if not count:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0, dtype=bool), np.empty(0, dtype=np.float64)
+
+    dates, starts, statuses, prices = zip(*rows)
+    date_ord = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=count)
+    start_min = np.fromiter((t.hour * 60 + t.minute for t in starts), dtype=np.int64, count=count)
+    booked = np.fromiter((s == 'booked' for s in statuses), dtype=bool, count=count)
+    price = np.fromiter((float(p) for p in prices), dtype=np.float64, count=count)
+    return date_ord, start_min, booked, price
+
+
+def compute_heatmap(date_ord, start_min, booked, price):
+    """Fold slot columns into weekday x hour matrices (Monday = row 0)."""
+    # date(1, 1, 1) has ordinal 1 and is a Monday
+    cell = ((date_ord - 1) % 7) * 24 + start_min // 60
+    offered = np.bincount(cell, minlength=CELLS).reshape(7, 24)
+    sold = np.bincount(cell, weights=booked.astype(np.float64), minlength=CELLS).reshape(7, 24)
+    revenue = np.bincount(cell, weights=np.where(booked, price, 0.0), minlength=CELLS).reshape(7, 24)
+    occupancy = np.divide(sold, offered, out=np.zeros((7, 24)), where=offered > 0)
+    return {
+        'offered': offered.astype(int).tolist(),
+        'booked': sold.astype(int).tolist(),
+        'occupancy': np.round(occupancy * 100, 1).tolist(),
+        'revenue': np.round(revenue, 2).tolist(),
+    }
+
+
+def turf_heatmap(turf_id, days=HEATMAP_DAYS):
+    """Return the cached heatmap for the last ``days`` days of a turf's slots."""
+    today = timezone.localdate()
+    key = f'turf-heatmap:{turf_id}:{days}:{today.isoformat()}'
+
+    def build():
+        start = today - timedelta(days=days)
+        result = compute_heatmap(*load_slot_columns(turf_id, start, today))
+        result['start'] = start.isoformat()
+        result['end'] = today.isoformat()
+        return result
+
+    return cached(key, build, HEATMAP_CACHE_TIMEOUT)
@@ -0,0 +1,190 @@
+"""Stampede-safe caching and whole-page caching.
+
+``cached(key, build, timeout)`` returns the cached value of ``key`` or
+stores ``build()``. Values are kept ``settings.CACHE_STALE_TTL`` seconds
+past their timeout: once stale, the first caller to take the key's lock
+rebuilds the value while everyone else keeps getting the stale copy, and a
+key that is missing altogether is built by one caller while the others
+wait for it (up to ``settings.CACHE_LOCK_WAIT`` seconds). The lock is a
+``cache.add``, so it covers every worker sharing the cache backend.
+
+``@cached_view('prefix', timeout)`` caches a view's whole ``GET`` response
+per role (``vary='role'``) or per user (``vary='user'``); anonymous
+visitors share one copy. ``invalidate_prefix`` drops every page cached
+under a prefix.
+
+Lookups are counted per key prefix (the part before the first ``:``) in
+``bmt.metrics``; ``cache_stats()`` returns the counts of all workers.
+``invalidate`` only reaches other workers when the cache is shared between
+them (``is_shared()``); callers that rely on it should keep entries short
+otherwise.
+"""
+import hashlib
+import time
+from collections import defaultdict, namedtuple
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+
+from mysite.caches import is_shared_cache
+from .metrics import CACHE_LOOKUPS, collect
+
+OUTCOMES = ('hit', 'stale', 'miss', 'refresh', 'wait')
+
+Entry = namedtuple('Entry', 'value fresh_until')
+
+
+def _record(key, outcome):
+    CACHE_LOOKUPS.inc(prefix=key.split(':', 1)[0], outcome=outcome)
+
+
+def cache_stats():
+    """``{prefix: {outcome: count}}`` for the lookups made by every worker."""
+    stats = defaultdict(lambda: dict.fromkeys(OUTCOMES, 0))
+    for (prefix, outcome), count in collect()[CACHE_LOOKUPS.name].items():
+        stats[prefix][outcome] = count
+    return dict(sorted(stats.items()))
+
+
+def _store(cache, key, value, timeout, stale):
+    cache.set(key, Entry(value, time.time() + timeout), timeout + stale)
+
+
+def _build_and_store(cache, key, build, timeout, stale):
+    value, storable = build()
+    if storable:
+        _store(cache, key, value, timeout, stale)
+    return value
+
+
+def get_or_build(key, build, timeout, stale=None, alias='default'):
+    """Like ``cached``, but ``build()`` returns ``(value, storable)`` so the
+    caller can decide after building that a value must not be kept."""
+    cache = caches[alias]
+    if stale is None:
+        stale = getattr(settings, 'CACHE_STALE_TTL', 60)
+    lock_key = f'{key}:lock'
+    lock_timeout = getattr(settings, 'CACHE_LOCK_TIMEOUT', 30)
+
+    entry = cache.get(key)
+    if isinstance(entry, Entry):
+        if time.time() < entry.fresh_until:
+            _record(key, 'hit')
+            return entry.value
+        if not cache.add(lock_key, 1, lock_timeout):
+            # Someone else is refreshing it
+            _record(key, 'stale')
+            return entry.value
+        _record(key, 'refresh')
+        try:
+            return _build_and_store(cache, key, build, timeout, stale)
+        finally:
+            cache.delete(lock_key)
+
+    if not cache.add(lock_key, 1, lock_timeout):
+        deadline = time.monotonic() + getattr(settings, 'CACHE_LOCK_WAIT', 2)
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if isinstance(entry, Entry):
+                _record(key, 'wait')
+                return entry.value
+        # The builder is slow or gone: build it ourselves rather than fail
+        _record(key, 'miss')
+        return _build_and_store(cache, key, build, timeout, stale)
+
+    _record(key, 'miss')
+    try:
+        return _build_and_store(cache, key, build, timeout, stale)
+    finally:
+        cache.delete(lock_key)
+
+
+def cached(key, build, timeout, stale=None, alias='default'):
+    """Return the cached value of ``key``, building it with ``build()`` when
+    missing or stale; see the module docstring."""
+    return get_or_build(key, lambda: (build(), True), timeout, stale, alias)
+
+
+def invalidate(*keys, alias='default'):
+    caches[alias].delete_many(keys)
+
+
+def is_shared(alias='default'):
+    """Whether cache ``alias`` is seen by every worker process."""
+    return is_shared_cache(settings.CACHES[alias])
+
+
+# -- Whole-page caching --
+
+def _generation(prefix):
+    return caches['default'].get(f'{prefix}:generation', 0)
+
+
+def invalidate_prefix(*prefixes):
+    """Make every page cached under ``prefixes`` a miss."""
+    cache = caches['default']
+    for prefix in prefixes:
+        key = f'{prefix}:generation'
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr()
+            cache.set(key, 1, None)
+
+
+def _scope(request, vary):
+    user = request.user
+    if not user.is_authenticated:
+        return 'anon'
+    if vary == 'role':
+        return f'role-{user.role}'
+    # The page may hold a CSRF token, which only fits the client's CSRF cookie
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return f'user-{user.pk}-{hashlib.md5(csrf_cookie.encode()).hexdigest()[:8]}'
+
+
+def page_key(prefix, request, vary):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'{prefix}:{_generation(prefix)}:{_scope(request, vary)}:{path}'
+
+
+def _storable(request, response, scope):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    messages = getattr(request, '_messages', None)
+    if messages is not None and messages.used:
+        # The page shows one-off flash messages
+        return False
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+        # A CSRF token can only be replayed to the client it was made for
+        return scope.startswith('user-') and settings.CSRF_COOKIE_NAME in request.COOKIES
+    return True
+
+
+def cached_view(prefix, timeout, vary='role', stale=None):
+    """Cache a view's ``GET`` responses for ``timeout`` seconds.
+
+    Put it below the role decorators so access checks still run. Responses
+    that are not a plain ``200``, set cookies, show flash messages or carry
+    a CSRF token the next visitor could not use are never stored.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not getattr(settings, 'PAGE_CACHE_ENABLED', True):
+                return view_func(request, *args, **kwargs)
+            key = page_key(prefix, request, vary)
+            scope = key.split(':')[2]
+
+            def build():
+                response = view_func(request, *args, **kwargs)
+                if hasattr(response, 'render') and callable(response.render):
+                    response.render()
+                return response, _storable(request, response, scope)
+
+            return get_or_build(key, build, timeout, stale)
+        return wrapper
+    return decorator
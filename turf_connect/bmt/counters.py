@@ -0,0 +1,116 @@
+"""Site-wide counters for the admin dashboard.
+
+Counts are stored in ``SiteCounter`` rows and moved by signal handlers with
+``F()`` updates, so the dashboard reads them with a single query instead of
+running ``COUNT(*)`` over whole tables; ``cached_counters`` keeps that read
+in the cache for ``COUNTERS_CACHE_TIMEOUT`` seconds. ``reconcile`` recomputes them from the
+source tables; ``manage.py reconcile_counters`` runs it periodically.
+Archived bookings still count as bookings: ``turfs.archive`` deletes the
+live rows inside ``suspend_counters('bookings')``.
+"""
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db.models import F
+
+from .caching import cached
+from .models import SiteCounter
+from .sharding import fan_out, is_sharded
+
+COUNTER_NAMES = ('turfs', 'turfs_pending', 'users', 'bookings')
+COUNTERS_CACHE_KEY = 'admin-stats:counters'
+COUNTERS_CACHE_TIMEOUT = 30
+
+_batch = threading.local()
+
+
+def _sources():
+    from accounts.models import User
+    from turfs.models import ArchivedBooking, Booking, Turf
+
+    return {
+        'turfs': [Turf.objects.all()],
+        'turfs_pending': [Turf.objects.filter(status='pending')],
+        'users': [User.objects.all()],
+        'bookings': [Booking.objects.all(), ArchivedBooking.objects.all()],
+    }
+
+
+def _count(queryset):
+    return sum(fan_out(queryset.count)) if is_sharded(queryset.model) else queryset.count()
+
+
+def reconcile(names=COUNTER_NAMES):
+    """Recount ``names`` from their tables; return ``{name: (stored, actual)}``
+    for every counter that had drifted."""
+    sources = _sources()
+    stored = dict(SiteCounter.objects.filter(name__in=names).values_list('name', 'value'))
+    drift = {}
+    for name in names:
+        actual = sum(_count(queryset) for queryset in sources[name])
+        if stored.get(name) != actual:
+            SiteCounter.objects.update_or_create(name=name, defaults={'value': actual})
+            drift[name] = (stored.get(name), actual)
+    return drift
+
+
+def _apply(name, delta):
+    if not SiteCounter.objects.filter(name=name).update(value=F('value') + delta):
+        # First use: start from the real count, which already includes this change
+        reconcile([name])
+
+
+def bump(name, delta=1):
+    """Move counter ``name`` by ``delta`` (deferred inside ``batch_counters``)."""
+    if not delta or name in getattr(_batch, 'suspended', ()):
+        return
+    pending = getattr(_batch, 'deltas', None)
+    if pending is not None:
+        pending[name] += delta
+    else:
+        _apply(name, delta)
+
+
+@contextmanager
+def batch_counters():
+    """Collect counter changes made inside the block and write each counter
+    once at the end, for bulk deletes and updates."""
+    if getattr(_batch, 'deltas', None) is not None:
+        yield
+        return
+    _batch.deltas = Counter()
+    try:
+        yield
+        deltas = _batch.deltas
+    finally:
+        _batch.deltas = None
+    for name, delta in deltas.items():
+        if delta:
+            _apply(name, delta)
+
+
+@contextmanager
+def suspend_counters(*names):
+    """Leave counters ``names`` alone for changes made inside the block, for
+    rows that move to another counted table rather than go away."""
+    outer = getattr(_batch, 'suspended', frozenset())
+    _batch.suspended = outer | set(names)
+    try:
+        yield
+    finally:
+        _batch.suspended = outer
+
+
+def read_counters():
+    """Return all dashboard counters in one query, filling in missing ones."""
+    values = dict(SiteCounter.objects.filter(name__in=COUNTER_NAMES).values_list('name', 'value'))
+    missing = [name for name in COUNTER_NAMES if name not in values]
+    if missing:
+        values.update({name: actual for name, (_, actual) in reconcile(missing).items()})
+    return values
+
+
+def cached_counters():
+    """``read_counters`` through the cache, for the admin dashboard."""
+    return cached(COUNTERS_CACHE_KEY, read_counters, COUNTERS_CACHE_TIMEOUT)
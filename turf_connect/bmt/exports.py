@@ -0,0 +1,222 @@
+"""Streaming CSV and XLSX exports of bookings with their slots and payments.
+
+Bookings come from ``turfs.archive.iter_booking_history``, archived ones
+included, one shard after another. They are read in chunks of
+``EXPORT_CHUNK_SIZE``; each chunk's turfs, players, slots and payments are
+fetched with one query per table and the rows are written by generators,
+so memory use stays flat and the first bytes go out before the query
+finishes. XLSX files are produced by streaming a minimal SpreadsheetML
+package through ``zipfile`` on an unseekable buffer.
+
+Text cells that a spreadsheet would read as a formula (turf names and
+usernames are user input) are prefixed with ``'`` in both formats.
+"""
+import csv
+import zipfile
+from collections import defaultdict
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from django.contrib.auth import get_user_model
+
+from turfs.archive import iter_booking_history
+from turfs.models import ArchivedBooking, ArchivedSlot, Booking, Payment, Slot, Turf
+from .sharding import shards, use_shard
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_HEADER = [
+    'Booking ID', 'Turf', 'City', 'Player', 'Player Email', 'Date', 'Slots',
+    'Amount', 'Status', 'Payment ID', 'Payment Status', 'Created At',
+]
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _slot_times(slot_ids):
+    """``{slot_id: (start_time, end_time)}`` from the live and archived slots."""
+    times = {}
+    for model, id_field in ((Slot, 'id'), (ArchivedSlot, 'slot_id')):
+        missing = [pk for pk in slot_ids if pk not in times]
+        if not missing:
+            break
+        rows = model.objects.filter(**{f'{id_field}__in': missing}).values_list(id_field, 'start_time', 'end_time')
+        times.update((pk, (start, end)) for pk, start, end in rows)
+    return times
+
+
+def _export_rows(bookings):
+    turfs = Turf.objects.in_bulk({b['turf_id'] for b in bookings})
+    players = get_user_model()._default_manager.in_bulk({b['player_id'] for b in bookings})
+    live_ids = [b['booking_id'] for b in bookings if not b['archived']]
+    archived_ids = [b['booking_id'] for b in bookings if b['archived']]
+
+    slot_ids = defaultdict(list)
+    payments = defaultdict(list)  # newest first, as (payment_id, status)
+    links = Booking.slots.through.objects.filter(booking_id__in=live_ids).values_list('booking_id', 'slot_id')
+    for booking_id, slot_id in links:
+        slot_ids[booking_id].append(slot_id)
+    rows = (
+        Payment.objects.filter(booking_id__in=live_ids)
+        .order_by('-created_at').values_list('booking_id', 'payment_id', 'status')
+    )
+    for booking_id, payment_id, status in rows:
+        payments[booking_id].append((payment_id, status))
+    rows = ArchivedBooking.objects.filter(booking_id__in=archived_ids).values_list('booking_id', 'slot_ids', 'payments')
+    for booking_id, archived_slot_ids, archived_payments in rows:
+        slot_ids[booking_id] = archived_slot_ids
+        payments[booking_id] = [
+            (p['payment_id'], p['status'])
+            for p in sorted(archived_payments, key=lambda p: p['created_at'], reverse=True)
+        ]
+    times = _slot_times({pk for ids in slot_ids.values() for pk in ids})
+
+    for booking in bookings:
+        booking_id = booking['booking_id']
+        turf = turfs.get(booking['turf_id'])
+        player = players.get(booking['player_id'])
+        booking_payments = payments[booking_id]
+        payment = next((p for p in booking_payments if p[1] == 'success'), booking_payments[0] if booking_payments else None)
+        slots = sorted(times[pk] for pk in slot_ids[booking_id] if pk in times)
+        yield [
+            booking_id,
+            turf.name if turf else '',
+            turf.city if turf else '',
+            player.username if player else '',
+            player.email if player else '',
+            booking['date'].strftime('%Y-%m-%d'),
+            ', '.join(f"{start.strftime('%H:%M')}-{end.strftime('%H:%M')}" for start, end in slots),
+            booking['total_amount'],
+            booking['status'],
+            payment[0] if payment else '',
+            payment[1] if payment else '',
+            booking['created_at'].isoformat(),
+        ]
+
+
+def iter_export_rows(turf_ids=None, start=None, end=None):
+    """Yield one list of cell values per booking, header first, for the
+    bookings on ``turf_ids`` (all turfs when ``None``) between ``start`` and
+    ``end``."""
+    yield EXPORT_HEADER
+    for alias in shards():
+        with use_shard(alias):
+            history = iter_booking_history(turf_ids, start, end, chunk_size=EXPORT_CHUNK_SIZE)
+            for chunk in _chunks(history, EXPORT_CHUNK_SIZE):
+                yield from _export_rows(chunk)
+
+
+class _Echo:
+    """File-like object that hands back whatever is written to it."""
+
+    def write(self, value):
+        return value
+
+
+FORMULA_PREFIXES = ('=', '+', '-', '@')
+
+
+def _text(value):
+    """``value`` as text a spreadsheet will not evaluate as a formula."""
+    value = str(value)
+    return "'" + value if value.startswith(FORMULA_PREFIXES) else value
+
+
+def stream_csv(rows):
+    writer = csv.writer(_Echo())
+    for row in rows:
+        yield writer.writerow([_text(v) if isinstance(v, str) else v for v in row])
+
+
+class _ChunkBuffer:
+    """Unseekable sink for ``zipfile``; collected bytes are drained by the generator."""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Bookings" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c t="n"><v>{value}</v></c>'
+    if hasattr(value, 'as_tuple'):  # Decimal
+        return f'<c t="n"><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(_text(value))}</t></is></c>'
+
+
+def stream_xlsx(rows, flush_every=500):
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            for count, row in enumerate(rows, start=1):
+                sheet.write(('<row>' + ''.join(_xlsx_cell(v) for v in row) + '</row>').encode('utf-8'))
+                if count % flush_every == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
@@ -0,0 +1,86 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.urls import reverse
+
+MODES = ('fresh', 'persistent', 'pooled')
+
+
+class Command(BaseCommand):
+    help = (
+        "Time requests to the health check with a new database connection per "
+        "request, persistent connections and (Postgres only) the connection pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('modes', nargs='*', help=f"Modes to compare: {', '.join(MODES)} (default: all available).")
+        parser.add_argument('--requests', type=int, default=500, help="Requests per mode.")
+
+    def handle(self, *args, **options):
+        pool_available = connection.vendor == 'postgresql'
+        names = options['modes'] or [mode for mode in MODES if mode != 'pooled' or pool_available]
+        unknown = [name for name in names if name not in MODES]
+        if unknown:
+            raise CommandError(f"Unknown modes: {', '.join(unknown)}")
+        if 'pooled' in names and not pool_available:
+            raise CommandError("Connection pooling needs the PostgreSQL backend (set DATABASE_URL).")
+
+        original = {key: connection.settings_dict.get(key) for key in ('CONN_MAX_AGE', 'OPTIONS')}
+        self.stdout.write(f"Database: {connection.vendor} ({connection.settings_dict['NAME']})")
+        try:
+            for name in names:
+                result = self.run_mode(name, options['requests'], original)
+                self.stdout.write(
+                    f"{name:11} {result['rate']:8.1f} requests/s  "
+                    f"{result['ms']:6.2f} ms/request  "
+                    f"{result['connections']:5d} connections opened"
+                )
+        finally:
+            self.configure(original['CONN_MAX_AGE'], original['OPTIONS'])
+        self.stdout.write(self.style.SUCCESS(f"Compared {len(names)} modes."))
+
+    def configure(self, max_age, options):
+        connection.close()
+        if hasattr(connection, 'close_pool'):
+            connection.close_pool()
+        connection.settings_dict['CONN_MAX_AGE'] = max_age
+        connection.settings_dict['OPTIONS'] = options
+
+    def run_mode(self, name, requests, original):
+        options = dict(original['OPTIONS'] or {})
+        pool = options.pop('pool', None)
+        if name == 'fresh':
+            self.configure(0, options)
+        elif name == 'persistent':
+            self.configure(original['CONN_MAX_AGE'] or 60, options)
+        else:
+            self.configure(0, {**options, 'pool': pool or True})
+
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        client = Client(HTTP_HOST='localhost')
+        connection_created.connect(count)
+        try:
+            with override_settings(RATE_LIMIT_ENABLED=False):
+                started = time.perf_counter()
+                for _ in range(requests):
+                    response = client.get(reverse('healthz'))
+                    if response.status_code != 200:
+                        raise CommandError(f"healthz failed: {response.content[:200]!r}")
+                    # The test client skips the end-of-request cleanup; do it
+                    # here so CONN_MAX_AGE applies as it would in a worker
+                    close_old_connections()
+                elapsed = time.perf_counter() - started
+        finally:
+            connection_created.disconnect(count)
+        return {
+            'rate': requests / elapsed,
+            'ms': elapsed * 1000 / requests,
+            'connections': len(opened),
+        }
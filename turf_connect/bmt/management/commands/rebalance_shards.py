@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from bmt.counters import reconcile
+from bmt.models import CityShard
+from bmt.sharding import invalidate_shard_map, is_keyed, record_keys, shards
+from turfs.listing import invalidate_browse_listing, invalidate_turfs
+from turfs.models import (
+    ArchivedBooking, ArchivedSlot, Booking, DailyTurfStats, Payment, Slot, Turf, TurfImage,
+    TurfImageVariant, VerificationDocument,
+)
+
+# Copy order: parents before the rows that point at them
+COPY_PLAN = (
+    (Turf, 'id'),
+    (Slot, 'turf_id'),
+    (TurfImage, 'turf_id'),
+    (TurfImageVariant, 'image__turf_id'),
+    (VerificationDocument, 'turf_id'),
+    (DailyTurfStats, 'turf_id'),
+    (Booking, 'turf_id'),
+    (Booking.slots.through, 'booking__turf_id'),
+    (Payment, 'booking__turf_id'),
+    (ArchivedSlot, 'turf_id'),
+    (ArchivedBooking, 'turf_id'),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Move every turf of a city, with its slots, bookings, payments and history, "
+        "to another shard and point the city at it. App servers pick up the new map "
+        "within SHARD_MAP_TTL seconds, so run this while the city is quiet."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('city')
+        parser.add_argument('shard', help="Target database alias, e.g. shard_pune.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the rows that would move.")
+        parser.add_argument('--keep-source', action='store_true',
+                            help="Leave the copied rows on the old shard (delete them later by hand).")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per INSERT.")
+
+    def handle(self, *args, **options):
+        city = options['city'].strip().lower()
+        target = options['shard']
+        if target not in shards():
+            raise CommandError(f"Unknown shard {target!r}; configured: {', '.join(shards())}")
+
+        moved = []
+        for source in shards():
+            if source == target:
+                continue
+            turf_ids = list(Turf.objects.using(source).filter(city__iexact=city).values_list('id', flat=True))
+            if not turf_ids:
+                continue
+            moved += turf_ids
+            self.move(source, target, turf_ids, options)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Would move {len(moved)} turfs of {city} to {target}."))
+            return
+
+        CityShard.objects.using(DEFAULT_DB_ALIAS).update_or_create(city=city, defaults={'shard': target})
+        invalidate_shard_map()
+        if moved:
+            reconcile()
+            invalidate_browse_listing()
+            invalidate_turfs(moved)
+        self.stdout.write(self.style.SUCCESS(f"Moved {len(moved)} turfs of {city} to {target}."))
+
+    def move(self, source, target, turf_ids, options):
+        plan = [
+            (model, model._base_manager.using(source).filter(**{f'{lookup}__in': turf_ids}))
+            for model, lookup in COPY_PLAN
+        ]
+        for model, rows in plan:
+            self.stdout.write(f"{source} -> {target}: {rows.count()} {model._meta.label} rows")
+        if options['dry_run']:
+            return
+
+        # Owners and players are replicated already; this covers shards
+        # added after the users were created
+        User = get_user_model()
+        user_ids = set(Turf.objects.using(source).filter(id__in=turf_ids).values_list('owner_id', flat=True))
+        user_ids |= set(Booking.objects.using(source).filter(turf_id__in=turf_ids).values_list('player_id', flat=True))
+        User._base_manager.using(target).bulk_create(
+            User._base_manager.using(DEFAULT_DB_ALIAS).filter(id__in=user_ids), ignore_conflicts=True,
+        )
+
+        keyed_ids = []
+        with transaction.atomic(using=target):
+            for model, rows in plan:
+                objs = list(rows)
+                if is_keyed(model):
+                    keyed_ids += [obj.pk for obj in objs]
+                else:
+                    # Nothing refers to these ids; the target numbers them
+                    for obj in objs:
+                        obj.pk = None
+                model._base_manager.using(target).bulk_create(objs, batch_size=options['batch_size'])
+        record_keys(keyed_ids, target)
+
+        if not options['keep_source']:
+            # Raw deletes skip the delete signals: the files now belong to
+            # the copies, and the counters are reconciled afterwards
+            with transaction.atomic(using=source):
+                for model, rows in reversed(plan):
+                    rows._raw_delete(source)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from bmt.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount the admin dashboard counters and correct any drift."
+
+    def handle(self, *args, **options):
+        drift = reconcile()
+        for name, (stored, actual) in sorted(drift.items()):
+            self.stdout.write(f"{name}: {stored} -> {actual}")
+        self.stdout.write(self.style.SUCCESS(f"Corrected {len(drift)} counters."))
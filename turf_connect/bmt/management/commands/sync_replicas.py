@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from bmt.routers import replicas
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database onto each SQLite replica. For local "
+        "testing only; real replicas are kept in sync by the database server."
+    )
+
+    def handle(self, *args, **options):
+        aliases = replicas()
+        if not aliases:
+            raise CommandError("No replicas configured (set DATABASE_REPLICA_URLS).")
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError("Replicas can only be copied from a SQLite primary.")
+
+        primary.ensure_connection()
+        for alias in aliases:
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                raise CommandError(f"{alias} is not a SQLite database.")
+            replica.ensure_connection()
+            # The backup API copies a consistent snapshot, even in WAL mode
+            primary.connection.backup(replica.connection)
+            replica.close()
+            self.stdout.write(f"{alias}: copied from {primary.settings_dict['NAME']}")
+        self.stdout.write(self.style.SUCCESS(f"Synced {len(aliases)} replicas."))
@@ -0,0 +1,274 @@
+"""Counters and histograms in the Prometheus text format.
+
+Metrics are declared once at module level (``HOLDS_ATTEMPTED.inc()``,
+``REQUEST_LATENCY.observe(0.12, view='turf_detail')``) and kept in memory
+per process. ``render()`` produces the text served at ``/metrics``.
+
+Gunicorn and uWSGI run several worker processes, and a scrape reaches
+only one of them. With ``settings.METRICS_DIR`` set to a directory all
+workers share, each worker writes its totals to a file of its own
+there, at most every ``settings.METRICS_FLUSH_INTERVAL`` seconds and at
+exit. ``render()`` adds up every file plus the live values of the
+serving process, so other workers' numbers lag by at most that
+interval. Counters and histograms only ever grow, so what exited workers
+counted is kept: ``mark_process_dead(pid)`` folds a dead worker's file
+into ``metrics-dead.json``. Call it from the server's worker-exit hook,
+e.g. in the Gunicorn config::
+
+    def child_exit(server, worker):
+        from bmt.metrics import mark_process_dead
+        mark_process_dead(worker.pid)
+
+Empty the directory when the service is deployed.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+
+DEAD_FILE = 'metrics-dead.json'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = {}
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_process = {'pid': None, 'file': None, 'flushed': 0.0}
+
+
+def _reset_after_fork():
+    # A forked worker starts from zero under its own file; whatever the
+    # parent counted stays with the parent
+    pid = os.getpid()
+    if _process['pid'] != pid:
+        _process.update(pid=pid, file=f'metrics-{pid}-{uuid.uuid4().hex[:8]}.json', flushed=0.0)
+        for metric in REGISTRY.values():
+            metric.values.clear()
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        REGISTRY[name] = self
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _update(self, labels, change):
+        key = self._key(labels)
+        with _lock:
+            _reset_after_fork()
+            self.values[key] = change(self.values.get(key))
+        _maybe_flush()
+
+    def format_labels(self, key, extra=()):
+        pairs = [*zip(self.labelnames, key), *extra]
+        if not pairs:
+            return ''
+        escaped = (
+            (name, value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"'))
+            for name, value in pairs
+        )
+        return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self._update(labels, lambda value: (value or 0) + amount)
+
+    @staticmethod
+    def merge(a, b):
+        return a + b
+
+    def samples(self, values):
+        if not values and not self.labelnames:
+            values = {(): 0}
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{self.format_labels(key)} {value}'
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        # [count per bucket..., count above the last bucket, sum]
+        index = bisect_left(self.buckets, value)
+
+        def change(state):
+            state = state or [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+            return state
+
+        self._update(labels, change)
+
+    @staticmethod
+    def merge(a, b):
+        return [x + y for x, y in zip(a, b)]
+
+    def samples(self, values):
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), state[:-1]):
+                cumulative += count
+                yield f'{self.name}_bucket{self.format_labels(key, [("le", str(bound))])} {cumulative}'
+            yield f'{self.name}_sum{self.format_labels(key)} {state[-1]}'
+            yield f'{self.name}_count{self.format_labels(key)} {cumulative}'
+
+
+def _directory():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def _snapshot():
+    with _lock:
+        _reset_after_fork()
+        return {
+            name: [[list(key), value] for key, value in metric.values.items()]
+            for name, metric in REGISTRY.items() if metric.values
+        }
+
+
+def flush():
+    """Write this process's totals to its file in ``METRICS_DIR``."""
+    directory = _directory()
+    if not directory:
+        return
+    with _flush_lock:
+        snapshot = _snapshot()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, _process['file'])
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as fh:
+            json.dump(snapshot, fh)
+        os.replace(temporary, path)
+        _process['flushed'] = time.monotonic()
+
+
+def _maybe_flush():
+    if (
+        _directory()
+        and time.monotonic() - _process['flushed'] >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        and not _flush_lock.locked()
+    ):
+        flush()
+
+
+atexit.register(flush)
+
+
+def _add(totals, snapshot):
+    """Add the entries of a flushed ``snapshot`` to ``totals``."""
+    for name, entries in snapshot.items():
+        metric = REGISTRY.get(name)
+        if metric is None:
+            continue
+        values = totals.setdefault(name, {})
+        for key, value in entries:
+            key = tuple(key)
+            current = values.get(key)
+            values[key] = value if current is None else metric.merge(current, value)
+
+
+def _read(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def mark_process_dead(pid):
+    """Fold the files of exited worker ``pid`` into ``DEAD_FILE``.
+
+    Meant for the server's worker-exit hook, which runs in one process at a
+    time; two processes folding at once could lose counts.
+    """
+    directory = _directory()
+    if not directory or not os.path.isdir(directory):
+        return
+    prefix = f'metrics-{pid}-'
+    paths = [
+        os.path.join(directory, filename) for filename in os.listdir(directory)
+        if filename.startswith(prefix) and filename.endswith('.json')
+    ]
+    if not paths:
+        return
+    totals = {}
+    dead_path = os.path.join(directory, DEAD_FILE)
+    for path in [dead_path, *paths]:
+        try:
+            _add(totals, _read(path))
+        except FileNotFoundError:
+            pass
+    temporary = f'{dead_path}.tmp'
+    with open(temporary, 'w') as fh:
+        json.dump({name: [[list(key), value] for key, value in values.items()] for name, values in totals.items()}, fh)
+    os.replace(temporary, dead_path)
+    for path in paths:
+        os.remove(path)
+
+
+def collect():
+    """``{name: {label_values: value}}`` summed over every worker."""
+    totals = {name: {} for name in REGISTRY}
+    directory = _directory()
+    if directory and os.path.isdir(directory):
+        for filename in os.listdir(directory):
+            if not filename.endswith('.json') or filename == _process['file']:
+                continue
+            try:
+                _add(totals, _read(os.path.join(directory, filename)))
+            except (OSError, ValueError):
+                # Being replaced right now; it is counted at the next scrape
+                continue
+    _add(totals, _snapshot())
+    return totals
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for name, values in collect().items():
+        metric = REGISTRY[name]
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        lines.extend(metric.samples(values))
+    return '\n'.join(lines) + '\n'
+
+
+# -- Booking funnel --
+
+HOLDS_ATTEMPTED = Counter('bmt_holds_attempted_total', "Slot hold requests.")
+HOLDS_SUCCEEDED = Counter('bmt_holds_succeeded_total', "Slot holds that created a pending booking.")
+HOLDS_CONFLICTED = Counter('bmt_holds_conflicted_total', "Slot holds refused because a slot was taken.")
+BOOKINGS_EXPIRED = Counter('bmt_bookings_expired_total', "Pending bookings cancelled when their hold ran out.")
+PAYMENTS = Counter(
+    'bmt_payments_total', "Payment attempts by result (success, failure, expired, error).", ['result'],
+)
+CANCELLATIONS = Counter('bmt_cancellations_total', "Pending bookings cancelled by the player.")
+
+# -- Requests --
+
+REQUEST_LATENCY = Histogram('bmt_request_duration_seconds', "Time to build the response, per view.", ['view'])
+REQUEST_DB_TIME = Histogram('bmt_request_db_seconds', "Time spent in database queries, per view.", ['view'])
+
+# -- Cache (bmt.caching) --
+
+CACHE_LOOKUPS = Counter('bmt_cache_lookups_total', "Cache lookups by key prefix and outcome.", ['prefix', 'outcome'])
@@ -0,0 +1,200 @@
+"""Middleware for write load and database routing.
+
+SQLite lets one writer in at a time; past a handful of concurrent writes,
+extra requests only queue on the database lock and hold worker threads.
+``ConcurrencyLimitMiddleware`` admits at most
+``settings.MAX_CONCURRENT_WRITES`` unsafe-method requests per process, lets
+the next ones wait up to ``settings.WRITE_QUEUE_TIMEOUT`` seconds for a
+slot, and answers the rest with ``503 Service Unavailable``.
+``HashingBusyMiddleware`` gives the same answer to logins turned away by
+the password hashing cap in ``accounts.hashing``, wherever they
+authenticate (the site's login pages, ``/admin/login/``).
+
+``ReplicaPinMiddleware`` keeps clients that have just written reading from
+the primary database; see ``bmt.routers``. ``ShardMiddleware`` sends each
+request to the shard of the turf it is about; see ``bmt.sharding``.
+
+``QueryProfileMiddleware`` profiles the SQL of a sample of requests; see
+``bmt.profiling``. ``MetricsMiddleware`` records every request's latency
+and database time per view for ``/metrics``; see ``bmt.metrics``.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+
+from accounts.hashing import HashingBusy
+from .metrics import REQUEST_DB_TIME, REQUEST_LATENCY
+from .profiling import QueryProfile, QueryTimer, log_if_slow, log_profile
+from .routers import begin_request, end_request, replicas
+from .sharding import set_shard, shard_for_view, sharding_enabled, use_shard
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def server_busy():
+    response = HttpResponse(
+        "The server is busy. Please try again in a moment.",
+        status=503,
+        content_type='text/plain',
+    )
+    response['Retry-After'] = '1'
+    return response
+
+
+class ConcurrencyLimitMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limit = getattr(settings, 'MAX_CONCURRENT_WRITES', 8)
+        self.timeout = getattr(settings, 'WRITE_QUEUE_TIMEOUT', 0.5)
+        self.slots = threading.BoundedSemaphore(self.limit)
+
+    def __call__(self, request):
+        if request.method in SAFE_METHODS:
+            return self.get_response(request)
+        if not self.slots.acquire(timeout=self.timeout):
+            return server_busy()
+        try:
+            return self.get_response(request)
+        finally:
+            self.slots.release()
+
+
+class HashingBusyMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, HashingBusy):
+            return server_busy()
+        return None
+
+
+class ReplicaPinMiddleware:
+    """Track each request for ``bmt.routers.ReplicaRouter`` and pin clients
+    that have just written to the primary database."""
+
+    cookie_name = 'primary_pin'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+    def __call__(self, request):
+        if not replicas():
+            return self.get_response(request)
+        token = begin_request(pinned=self.cookie_name in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            state = end_request(token)
+        wrote = state.wrote or request.method not in SAFE_METHODS
+        if wrote and response.status_code < 400:
+            response.set_cookie(
+                self.cookie_name, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class ShardMiddleware:
+    """Route each request to the shard of the turf, slot or booking named in
+    its URL. Views that take the id from the body call
+    ``bmt.sharding.set_shard`` themselves."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not sharding_enabled():
+            return self.get_response(request)
+        # Scopes whatever process_view or the view sets to this request
+        with use_shard(None):
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if sharding_enabled():
+            set_shard(shard_for_view(view_kwargs))
+
+
+class QueryProfileMiddleware:
+    """Profile ``settings.QUERY_PROFILE_SAMPLE_RATE`` of requests, plus any
+    that send ``X-Profile-Queries: 1`` while DEBUG is on or from an admin.
+
+    Profiled responses get a ``Server-Timing`` header with the query count
+    and database time. Streaming responses are profiled until they close.
+    """
+
+    header = 'X-Profile-Queries'
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_PROFILE_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'QUERY_PROFILE_SAMPLE_RATE', 0)
+
+    def wanted(self, request):
+        if request.headers.get(self.header) == '1':
+            user = getattr(request, 'user', None)
+            if settings.DEBUG or (user is not None and user.is_authenticated and user.role == 'admin'):
+                return True
+        return random.random() < self.sample_rate
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        if not self.wanted(request):
+            response = self.get_response(request)
+            log_if_slow(request, time.perf_counter() - started)
+            return response
+
+        profile = QueryProfile()
+        profile.start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            profile.stop()
+            raise
+
+        def finish():
+            profile.stop()
+            elapsed = time.perf_counter() - started
+            log_profile(request, profile, elapsed)
+            return elapsed
+
+        if response.streaming:
+            response._resource_closers.append(finish)
+        else:
+            response['Server-Timing'] = profile.server_timing(finish())
+        return response
+
+
+class MetricsMiddleware:
+    """Observe each request's duration and database time, labelled with
+    the name of the URL pattern it matched."""
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        timer = QueryTimer()
+        timer.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            timer.stop()
+        match = request.resolver_match
+        # Unmatched paths share one label so scanners cannot add series
+        view = (match.view_name if match else None) or 'unmatched'
+        REQUEST_LATENCY.observe(time.perf_counter() - started, view=view)
+        REQUEST_DB_TIME.observe(timer.duration, view=view)
+        return response
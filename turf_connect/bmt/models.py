@@ -14,3 +14,47 @@ class Profile(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.role}"
 
+
+
+class SiteCounter(models.Model):
+    """A named site-wide count shown on the admin dashboard.
+
+    Kept current by the signal handlers in ``bmt.signals`` and corrected by
+    ``manage.py reconcile_counters``.
+    """
+
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class CityShard(models.Model):
+    """Which database shard holds the turfs of a city.
+
+    Read through ``bmt.sharding.shard_map``; moved by
+    ``manage.py rebalance_shards``.
+    """
+
+    city = models.CharField(max_length=100, unique=True)
+    shard = models.CharField(max_length=50)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.city} -> {self.shard}"
+
+
+class ShardKey(models.Model):
+    """A globally unique id for a sharded turf, slot, booking or image, and
+    the shard holding that row.
+
+    Ids are handed out here rather than by each shard's own sequence so they
+    never collide when rows move between shards; see ``bmt.sharding``.
+    """
+
+    shard = models.CharField(max_length=50)
+
+    def __str__(self):
+        return f"{self.pk} @ {self.shard}"
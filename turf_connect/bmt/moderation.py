@@ -0,0 +1,51 @@
+"""Turf verification decisions.
+
+Approving or rejecting is a single ``UPDATE`` per shard however many turfs
+are selected. ``update()`` bypasses the model signals, so the pending
+counter and the browse listing and turf caches are adjusted here, once per
+batch.
+"""
+from django.db import transaction
+
+from turfs.listing import invalidate_browse_listing, invalidate_turfs
+from turfs.models import Turf
+from .caching import invalidate
+from .counters import COUNTERS_CACHE_KEY, bump
+from .sharding import atomic as shard_atomic, fan_out
+
+STATUS_FOR_ACTION = {'approve': 'approved', 'reject': 'rejected'}
+
+
+def verify_turfs(turf_ids, action, reason='', pending_only=True):
+    """Approve or reject ``turf_ids`` and return how many rows changed.
+
+    With ``pending_only`` (the bulk queue) turfs that were decided in the
+    meantime are left alone; the single-turf page may also reverse an
+    earlier decision.
+    """
+    status = STATUS_FOR_ACTION[action]
+
+    def verify_on_shard():
+        turfs = Turf.objects.filter(id__in=turf_ids)
+        if pending_only:
+            turfs = turfs.filter(status='pending')
+
+        with shard_atomic():
+            if pending_only:
+                updated = was_pending = turfs.update(status=status, rejection_reason=reason)
+            else:
+                was_pending = turfs.filter(status='pending').count()
+                updated = turfs.update(status=status, rejection_reason=reason)
+            bump('turfs_pending', -was_pending)
+        return updated
+
+    # One UPDATE per shard; ids that live elsewhere simply match nothing
+    updated = sum(fan_out(verify_on_shard))
+    if updated:
+        def invalidate_caches():
+            invalidate_browse_listing()
+            invalidate_turfs(turf_ids)
+            invalidate(COUNTERS_CACHE_KEY)
+
+        transaction.on_commit(invalidate_caches)
+    return updated
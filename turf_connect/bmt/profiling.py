@@ -0,0 +1,161 @@
+"""Per-request SQL profiling.
+
+``QueryProfile`` wraps every configured database connection of the current
+thread and records each query's duration and shape: its SQL with ``IN``
+lists collapsed, so the same statement for different ids counts as one.
+A shape run ``settings.QUERY_PROFILE_N_PLUS_ONE`` times or more in one
+request is an N+1 suspect, usually a template or loop walking a relation
+row by row (``booking.turf.images.first``). When a shape first crosses
+that line, the profile notes the template line being rendered and the
+innermost project line on the stack, so the stack is walked once per
+suspect rather than once per query.
+
+``bmt.middleware.QueryProfileMiddleware`` decides which requests to profile.
+"""
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+IN_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+SHAPE_PREVIEW = 300
+
+
+def sql_shape(sql):
+    """``sql`` with ``IN (%s, %s, ...)`` lists of any length made equal."""
+    return IN_LIST_RE.sub('(%s, ...)', sql)
+
+
+def query_origin(frame):
+    """Return ``(template_line, code_line)`` for the query run under ``frame``.
+
+    ``template_line`` is the innermost template node being rendered
+    (``ownerdashboard.html:212``), ``code_line`` the innermost frame in the
+    project's own code; either may be ``None``.
+    """
+    base_dir = str(settings.BASE_DIR) + os.sep
+    template = code = None
+    while frame is not None and (template is None or code is None):
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                template = f'{origin.template_name or origin.name}:{token.lineno}'
+        if code is None:
+            filename = frame.f_code.co_filename
+            if (
+                filename.startswith(base_dir)
+                and 'site-packages' not in filename
+                and filename != __file__
+            ):
+                code = f'{os.path.relpath(filename, base_dir)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return template, code
+
+
+class QueryTimer:
+    """Count the queries run on this thread between ``start`` and ``stop``
+    and the time spent in them, on every configured connection."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self._connections = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - started)
+
+    def record(self, sql, elapsed):
+        self.count += 1
+        self.duration += elapsed
+
+    def start(self):
+        for alias in settings.DATABASES:
+            connection = connections[alias]
+            connection.execute_wrappers.append(self)
+            self._connections.append(connection)
+
+    def stop(self):
+        for connection in self._connections:
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+        self._connections = []
+
+
+class QueryProfile(QueryTimer):
+    """A ``QueryTimer`` that also counts query shapes and finds N+1 suspects."""
+
+    def __init__(self, n_plus_one=None):
+        super().__init__()
+        self.n_plus_one = n_plus_one or getattr(settings, 'QUERY_PROFILE_N_PLUS_ONE', 5)
+        self.shapes = Counter()
+        self.shape_time = defaultdict(float)
+        self.origins = {}
+
+    def record(self, sql, elapsed):
+        super().record(sql, elapsed)
+        shape = sql_shape(sql)
+        self.shapes[shape] += 1
+        self.shape_time[shape] += elapsed
+        if self.shapes[shape] == self.n_plus_one:
+            # Skip record() and __call__ to start at the query's caller
+            self.origins[shape] = query_origin(sys._getframe(2))
+
+    def duplicates(self):
+        """``[(shape, count)]`` for every shape run more than once, most first."""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > 1]
+
+    def suspects(self):
+        """N+1 suspects as dicts of shape, count, time and origin."""
+        return [
+            {
+                'sql': shape[:SHAPE_PREVIEW],
+                'count': count,
+                'time_ms': round(self.shape_time[shape] * 1000, 1),
+                'template': self.origins[shape][0],
+                'code': self.origins[shape][1],
+            }
+            for shape, count in self.shapes.most_common()
+            if count >= self.n_plus_one
+        ]
+
+    def server_timing(self, elapsed):
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries", total;dur={elapsed * 1000:.1f}'
+
+
+def log_profile(request, profile, elapsed):
+    """Log a profiled request, its N+1 suspects, and whether it was slow."""
+    slow_ms = getattr(settings, 'QUERY_PROFILE_SLOW_MS', 500)
+    summary = (
+        f"{request.method} {request.path} took {elapsed * 1000:.0f} ms: "
+        f"{profile.count} queries in {profile.duration * 1000:.1f} ms, "
+        f"{len(profile.duplicates())} repeated shapes"
+    )
+    if elapsed * 1000 >= slow_ms:
+        logger.warning("Slow request %s", summary)
+    else:
+        logger.info("Profiled %s", summary)
+    for suspect in profile.suspects():
+        logger.warning(
+            "Possible N+1 on %s %s: %s queries (%s ms) from template %s, code %s: %s",
+            request.method, request.path, suspect['count'], suspect['time_ms'],
+            suspect['template'] or '-', suspect['code'] or '-', suspect['sql'],
+        )
+
+
+def log_if_slow(request, elapsed):
+    """Log an unprofiled request that took longer than ``QUERY_PROFILE_SLOW_MS``."""
+    if elapsed * 1000 >= getattr(settings, 'QUERY_PROFILE_SLOW_MS', 500):
+        logger.warning("Slow request %s %s took %.0f ms", request.method, request.path, elapsed * 1000)
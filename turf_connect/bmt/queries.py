@@ -0,0 +1,184 @@
+"""Query services for the dashboards.
+
+Each service fetches a bounded page of rows with its relations loaded up
+front, so templates and JSON serializers never trigger lazy queries. Pages
+are gathered from every shard and merged on the page's sort key.
+"""
+import logging
+from contextlib import ExitStack, contextmanager
+from datetime import date
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import OuterRef, Prefetch, Q, Subquery
+
+from turfs.models import Booking, Slot, Turf, TurfImage
+from .sharding import gather, shards
+
+logger = logging.getLogger(__name__)
+
+OWNER_BOOKINGS_PAGE_SIZE = 50
+PLAYER_BOOKINGS_PAGE_SIZE = 10
+PENDING_TURFS_PAGE_SIZE = 20
+# bookings (+ turf, player via JOIN) and one prefetch for slots, per shard
+OWNER_BOOKINGS_QUERY_BUDGET = 2
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised when a block of code runs more queries than it is allowed."""
+
+
+@contextmanager
+def query_budget(limit, label='query block'):
+    """Count queries run inside the block and enforce ``limit``.
+
+    Over-budget blocks are logged as errors, and raise
+    ``QueryBudgetExceeded`` when ``settings.QUERY_BUDGET_STRICT`` is on, as
+    tests that cover budgeted code turn it on so regressions fail them.
+    """
+    executed = []
+
+    def counter(execute, sql, params, many, context):
+        executed.append(sql)
+        return execute(sql, params, many, context)
+
+    with ExitStack() as stack:
+        for alias in shards():
+            stack.enter_context(connections[alias].execute_wrapper(counter))
+        yield executed
+
+    if len(executed) > limit:
+        message = f"{label} ran {len(executed)} queries (budget {limit})"
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.error(message)
+
+
+def encode_cursor(booking):
+    return f"{booking.date.isoformat()}_{booking.id}"
+
+
+def decode_cursor(cursor):
+    """Return ``(date, id)`` for a cursor string, or ``None`` if malformed."""
+    try:
+        date_str, booking_id = cursor.split('_', 1)
+        return date.fromisoformat(date_str), int(booking_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def owner_bookings_page(owner, cursor=None, page_size=OWNER_BOOKINGS_PAGE_SIZE):
+    """Return ``(bookings, next_cursor)`` for an owner's turfs, newest date first.
+
+    Pagination is keyset-based on ``(date, id)`` so deep pages cost the same
+    as the first one.
+    """
+    bookings = (
+        Booking.objects
+        .filter(turf__owner=owner)
+        .select_related('turf', 'player')
+        .prefetch_related(
+            Prefetch('slots', queryset=Slot.objects.order_by('start_time'))
+        )
+        .order_by('-date', '-id')
+    )
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        last_date, last_id = position
+        bookings = bookings.filter(Q(date__lt=last_date) | Q(date=last_date, id__lt=last_id))
+
+    with query_budget(OWNER_BOOKINGS_QUERY_BUDGET * len(shards()), label='owner_bookings_page'):
+        page = gather(bookings, page_size + 1, key=lambda b: (b.date, b.id), reverse=True)
+
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1])
+    return page, next_cursor
+
+
+def serialize_owner_booking(booking):
+    """Flatten a booking from ``owner_bookings_page`` for JSON responses."""
+    return {
+        'id': booking.id,
+        'turf': booking.turf.name,
+        'player': booking.player.username,
+        'date': booking.date.strftime('%Y-%m-%d'),
+        'amount': str(booking.total_amount),
+        'status': booking.status,
+        'slots': [
+            {
+                'date': slot.date.strftime('%Y-%m-%d'),
+                'start': slot.start_time.strftime('%H:%M'),
+            }
+            for slot in booking.slots.all()
+        ],
+    }
+
+
+def primary_image_prefetch(lookup='images'):
+    """Prefetch only the first-uploaded image of each turf into ``primary_images``.
+
+    The image's resized variants come along so templates can emit ``srcset``.
+    """
+    # Correlated on the outer row's turf, so only the prefetched turfs' images
+    # are looked at rather than grouping the whole table
+    first_id = TurfImage.objects.filter(turf=OuterRef('turf')).order_by('id').values('id')[:1]
+    return Prefetch(
+        lookup,
+        queryset=TurfImage.objects.filter(id=Subquery(first_id)).prefetch_related('variants'),
+        to_attr='primary_images',
+    )
+
+
+def player_bookings_page(player, before=None, page_size=PLAYER_BOOKINGS_PAGE_SIZE):
+    """Return ``(bookings, next_before)`` for a player's history, newest first.
+
+    Bookings are keyed on ``id`` (which follows ``created_at``), so the next
+    page is simply everything below the last id shown.
+    """
+    bookings = (
+        Booking.objects
+        .filter(player=player)
+        .select_related('turf')
+        .prefetch_related(primary_image_prefetch('turf__images'))
+        .order_by('-id')
+    )
+    if before:
+        try:
+            bookings = bookings.filter(id__lt=int(before))
+        except (TypeError, ValueError):
+            pass
+
+    page = gather(bookings, page_size + 1, key=lambda b: b.id, reverse=True)
+    next_before = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_before = page[-1].id
+    return page, next_before
+
+
+def pending_turfs_page(after=None, page_size=PENDING_TURFS_PAGE_SIZE):
+    """Return ``(turfs, next_after)`` for the verification queue, oldest first.
+
+    Owners, documents and the first photo are loaded with the page.
+    """
+    turfs = (
+        Turf.objects
+        .filter(status='pending')
+        .select_related('owner', 'verification')
+        .prefetch_related(primary_image_prefetch())
+        .order_by('id')
+    )
+    if after:
+        try:
+            turfs = turfs.filter(id__gt=int(after))
+        except (TypeError, ValueError):
+            pass
+
+    page = gather(turfs, page_size + 1, key=lambda t: t.id)
+    next_after = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_after = page[-1].id
+    return page, next_after
@@ -0,0 +1,128 @@
+"""Token-bucket rate limiting for hot endpoints.
+
+``@rate_limit('scope', user='10/m', ip='30/m')`` gives every key (the user,
+the client IP, the turf being booked, the email being logged in as) its own
+bucket of ``count`` tokens refilled evenly over the period. A request that
+finds any of its buckets empty gets ``429 Too Many Requests`` with a
+``Retry-After`` header and never reaches the view.
+
+Buckets live in the cache named by ``settings.RATE_LIMIT_CACHE``: the local
+memory cache limits per process, a shared cache (Redis, Memcached) limits
+across workers. ``settings.RATE_LIMITS`` overrides the rates of a scope,
+and a rate of ``None`` switches that key off.
+"""
+import hashlib
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+_lock = threading.Lock()
+
+
+def parse_rate(rate):
+    """``'10/m'`` -> ``(10, 60)``: ten requests per sixty seconds."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def client_ip(request):
+    if getattr(settings, 'RATE_LIMIT_TRUST_FORWARDED', False):
+        forwarded = request.headers.get('X-Forwarded-For')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _user_key(request):
+    if request.user.is_authenticated:
+        return f'u{request.user.pk}'
+    return f'ip{client_ip(request)}'
+
+
+def _email_key(request):
+    email = request.POST.get('email', '').strip().lower()
+    return email or None
+
+
+def _turf_key(request):
+    from turfs.models import Slot
+    from .sharding import locate
+
+    first_id = request.POST.get('slot_id', '').split(',')[0].strip()
+    if not first_id.isdigit():
+        return None
+    # Runs before the view picks the shard, so look the slot up on its own
+    alias = locate(Slot, first_id)
+    if alias is None:
+        return None
+    return Slot.objects.using(alias).filter(id=first_id).values_list('turf_id', flat=True).first()
+
+
+KEY_FUNCS = {
+    'user': _user_key,
+    'ip': client_ip,
+    'email': _email_key,
+    'turf': _turf_key,
+}
+
+
+def take_token(bucket, count, period):
+    """Spend one token from ``bucket``; return 0 if allowed, else the seconds
+    until a token is available."""
+    cache = caches[getattr(settings, 'RATE_LIMIT_CACHE', 'default')]
+    refill_rate = count / period
+    now = time.time()
+    # Read-modify-write: exact within a process, approximate across them
+    with _lock:
+        tokens, updated = cache.get(bucket, (count, now))
+        tokens = min(count, tokens + (now - updated) * refill_rate)
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0
+        else:
+            wait = (1 - tokens) / refill_rate
+        cache.set(bucket, (tokens, now), timeout=period + 1)
+    return wait
+
+
+def too_many_requests(retry_after):
+    seconds = max(1, math.ceil(retry_after))
+    response = HttpResponse(
+        f"Too many requests. Please try again in {seconds} seconds.",
+        status=429,
+        content_type='text/plain',
+    )
+    response['Retry-After'] = str(seconds)
+    return response
+
+
+def rate_limit(scope, methods=('POST',), **rates):
+    """Limit a view per key; see the module docstring."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in methods or not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+                return view_func(request, *args, **kwargs)
+            configured = {**rates, **getattr(settings, 'RATE_LIMITS', {}).get(scope, {})}
+            wait = 0
+            for key_name, rate in configured.items():
+                if not rate:
+                    continue
+                value = KEY_FUNCS[key_name](request)
+                if value is None:
+                    continue
+                count, period = parse_rate(rate)
+                digest = hashlib.md5(str(value).encode()).hexdigest()
+                wait = max(wait, take_token(f'ratelimit:{scope}:{key_name}:{digest}', count, period))
+            if wait:
+                return too_many_requests(wait)
+            return view_func(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,147 @@
+"""Database routers: city shards and read replicas.
+
+``ShardRouter`` comes first and places the sharded turf models on their
+city's shard; see ``bmt.sharding``. Whatever it leaves on ``default`` is
+then up to ``ReplicaRouter``.
+
+``ReplicaRouter`` sends reads to a replica (``settings.DATABASE_REPLICAS``)
+only inside views marked with ``@replica_reads``; everything else, and every
+write, uses ``default``. Replicas lag the primary, so once a client writes
+it is pinned to the primary:
+
+* for the rest of the request, as soon as the router hands out a write
+  connection or a transaction is open on ``default``;
+* for ``settings.REPLICA_PIN_SECONDS`` afterwards, through a cookie set by
+  ``bmt.middleware.ReplicaPinMiddleware`` on every successful unsafe
+  request.
+
+This gives a player who has just held a slot or paid their own writes back
+on the next page.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .sharding import active_shard, instance_shard, is_sharded, sharding_enabled
+
+# Models whose reads may be served by a replica. Sessions, auth and the
+# like (including accounts.User) always come from the primary.
+REPLICA_APPS = {'bmt', 'bookings', 'payments', 'turfs'}
+
+
+class ReplicaState:
+    """Per-request routing state."""
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned
+        self.reads_allowed = False
+        self.wrote = False
+
+
+_state = ContextVar('replica_state', default=None)
+
+
+def begin_request(pinned=False):
+    """Start tracking a request; returns the token for ``end_request``."""
+    return _state.set(ReplicaState(pinned))
+
+
+def end_request(token):
+    """Stop tracking and return the request's state."""
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def replicas():
+    return [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if alias in connections]
+
+
+def replica_reads(view_func):
+    """Let the view's reads go to a replica unless the client is pinned."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        state = _state.get()
+        if state is None:
+            return view_func(request, *args, **kwargs)
+        state.reads_allowed = True
+        try:
+            return view_func(request, *args, **kwargs)
+        finally:
+            state.reads_allowed = False
+    return wrapper
+
+
+class ShardRouter:
+
+    def _shard_for(self, model, hints):
+        if not sharding_enabled() or not is_sharded(model):
+            return None
+        instance = hints.get('instance')
+        alias = None
+        if instance is not None and is_sharded(instance.__class__):
+            alias = instance_shard(instance)
+        alias = alias or active_shard()
+        # default is left to the next router, which may pick a replica
+        return alias if alias != DEFAULT_DB_ALIAS else None
+
+    def db_for_read(self, model, **hints):
+        return self._shard_for(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._shard_for(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not sharding_enabled():
+            return None
+        sharded = [is_sharded(obj.__class__) for obj in (obj1, obj2)]
+        if not any(sharded):
+            return None
+        if all(sharded):
+            # An unsaved instance is saved to its parent's shard anyway
+            if obj1._state.adding or obj2._state.adding:
+                return True
+            return obj1._state.db == obj2._state.db
+        other = obj2 if sharded[0] else obj1
+        # Users are replicated to every shard
+        if other._meta.label == settings.AUTH_USER_MODEL:
+            return True
+        return None
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None
+            or not state.reads_allowed
+            or state.pinned
+            or state.wrote
+            or model._meta.app_label not in REPLICA_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return None
+        aliases = replicas()
+        return random.choice(aliases) if aliases else None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
@@ -0,0 +1,312 @@
+"""City sharding of turf inventory.
+
+Each turf, with its slots, images, documents, bookings, payments, stats and
+archive rows, lives on one database shard chosen by the turf's city. Shards
+are the aliases in ``settings.DATABASE_SHARDS`` (``default`` first); the
+city -> shard map is the ``CityShard`` table, falling back to
+``settings.SHARD_MAP`` and then ``settings.SHARD_DEFAULT``. Users are
+replicated to every shard so foreign keys and joins to them keep working.
+
+Queries find their shard in this order (see ``bmt.routers.ShardRouter``):
+
+* the instance they start from (``turf.slots``, saving a booking for a
+  turf, a new turf's city);
+* the request's shard, set by ``bmt.middleware.ShardMiddleware`` from the
+  turf, slot or booking the URL names, or by ``use_shard()``;
+* ``default``.
+
+Pages that list turfs across cities evaluate their querysets on every
+shard with ``gather()`` and ``per_shard()``; ``fan_out()`` runs any
+function once per shard.
+
+Turfs, slots, bookings and images take their ids from the ``ShardKey``
+table on ``default`` instead of the shard's own sequence, so ids stay
+unique when rows move between shards, and the same row says which shard
+an id lives on. Rows whose ids nothing refers to (payments, variants,
+stats, archives, slot links) keep per-shard sequences.
+
+With only ``default`` configured all of this is a no-op.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max
+
+SHARDED_APP = 'turfs'
+# Content-addressed files are shared by every shard
+UNSHARDED_MODELS = {'turfs.mediablob'}
+# Models whose ids appear in URLs, tokens or other rows
+KEYED_MODELS = {'turfs.turf', 'turfs.slot', 'turfs.booking', 'turfs.turfimage'}
+
+_active = ContextVar('active_shard', default=None)
+_keys = {'seeded': False}
+_map_cache = {'map': None, 'loaded_at': 0.0}
+
+
+def shards():
+    return list(getattr(settings, 'DATABASE_SHARDS', None) or [DEFAULT_DB_ALIAS])
+
+
+def sharding_enabled():
+    return len(shards()) > 1
+
+
+def is_sharded(model):
+    meta = model._meta
+    return meta.app_label == SHARDED_APP and meta.label_lower not in UNSHARDED_MODELS
+
+
+def is_keyed(model):
+    return model._meta.label_lower in KEYED_MODELS
+
+
+def keyed_models():
+    return [apps.get_model(label) for label in sorted(KEYED_MODELS)]
+
+
+# -- City map --
+
+def shard_map():
+    """Return ``{city: alias}``, cached for ``settings.SHARD_MAP_TTL`` seconds."""
+    from .models import CityShard
+
+    ttl = getattr(settings, 'SHARD_MAP_TTL', 30)
+    if _map_cache['map'] is None or time.monotonic() - _map_cache['loaded_at'] > ttl:
+        mapping = {city.lower(): alias for city, alias in getattr(settings, 'SHARD_MAP', {}).items()}
+        mapping.update(CityShard.objects.using(DEFAULT_DB_ALIAS).values_list('city', 'shard'))
+        _map_cache.update(map=mapping, loaded_at=time.monotonic())
+    return _map_cache['map']
+
+
+def invalidate_shard_map():
+    _map_cache['map'] = None
+
+
+def shard_for_city(city):
+    if not sharding_enabled():
+        return DEFAULT_DB_ALIAS
+    alias = shard_map().get((city or '').strip().lower()) or getattr(settings, 'SHARD_DEFAULT', DEFAULT_DB_ALIAS)
+    return alias if alias in shards() else DEFAULT_DB_ALIAS
+
+
+# -- Locating rows --
+
+def locate(model, pk):
+    """Return the shard holding ``model`` row ``pk``, or ``None``."""
+    from .models import ShardKey
+
+    if not sharding_enabled() or not is_sharded(model):
+        return DEFAULT_DB_ALIAS
+    try:
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    alias = ShardKey.objects.using(DEFAULT_DB_ALIAS).filter(pk=pk).values_list('shard', flat=True).first()
+    if alias in shards():
+        return alias
+    # Rows created before sharding was switched on have no key yet
+    for alias in shards():
+        if model._base_manager.using(alias).filter(pk=pk).exists():
+            if is_keyed(model):
+                record_keys([pk], alias)
+            return alias
+    return None
+
+
+PARENT_FIELDS = {
+    'turfs.slot': 'turf',
+    'turfs.turfimage': 'turf',
+    'turfs.turfimagevariant': 'image',
+    'turfs.verificationdocument': 'turf',
+    'turfs.booking': 'turf',
+    'turfs.booking_slots': 'booking',
+    'turfs.payment': 'booking',
+    'turfs.dailyturfstats': 'turf',
+}
+
+
+def instance_shard(instance):
+    """The shard a sharded model instance lives on (or will be saved to)."""
+    if instance._state.db and not instance._state.adding:
+        return instance._state.db
+    label = instance._meta.label_lower
+    if label == 'turfs.turf':
+        return shard_for_city(instance.city)
+    field_name = PARENT_FIELDS.get(label)
+    if field_name is None:
+        return None
+    field = instance._meta.get_field(field_name)
+    if field.is_cached(instance):
+        return instance_shard(field.get_cached_value(instance))
+    parent_id = getattr(instance, field.attname)
+    return locate(field.related_model, parent_id) if parent_id is not None else None
+
+
+# URL keyword -> model whose row decides the request's shard
+URL_KEYS = (('turf_id', 'turfs.Turf'), ('slot_id', 'turfs.Slot'), ('booking_id', 'turfs.Booking'))
+
+
+def shard_for_view(view_kwargs):
+    for name, label in URL_KEYS:
+        if view_kwargs.get(name) is not None:
+            return locate(apps.get_model(label), view_kwargs[name])
+    return None
+
+
+def current_shard():
+    """The shard queries without an instance to go by are sent to."""
+    return _active.get() or DEFAULT_DB_ALIAS
+
+
+def active_shard():
+    return _active.get()
+
+
+def set_shard(alias):
+    """Send the rest of the current request to ``alias``; used by views that
+    only learn which turf they serve from the request body."""
+    _active.set(alias)
+
+
+@contextmanager
+def use_shard(alias):
+    token = _active.set(alias)
+    try:
+        yield alias
+    finally:
+        _active.reset(token)
+
+
+def atomic(**kwargs):
+    """``transaction.atomic()`` on the current shard."""
+    return transaction.atomic(using=current_shard(), **kwargs)
+
+
+# -- Fan-out --
+
+def fan_out(func, *args, **kwargs):
+    """Call ``func`` once per shard with that shard active; return the results."""
+    if not sharding_enabled():
+        return [func(*args, **kwargs)]
+    results = []
+    for alias in shards():
+        with use_shard(alias):
+            results.append(func(*args, **kwargs))
+    return results
+
+
+def per_shard(queryset):
+    """Yield ``queryset`` bound to each shard in turn."""
+    if not sharding_enabled() or not is_sharded(queryset.model):
+        yield queryset
+        return
+    for alias in shards():
+        yield queryset.using(alias)
+
+
+def gather(queryset, limit=None, key=None, reverse=False):
+    """Evaluate ``queryset`` on every shard and merge the rows.
+
+    With ``key`` the merged rows are sorted like the queryset's ordering,
+    and ``limit`` then keeps the first rows overall; each shard is asked
+    for at most ``limit`` rows.
+    """
+    rows = []
+    for shard_queryset in per_shard(queryset):
+        rows.extend(shard_queryset[:limit] if limit is not None else shard_queryset)
+    if key is not None:
+        rows.sort(key=key, reverse=reverse)
+    return rows[:limit] if limit is not None else rows
+
+
+# -- Maintenance --
+
+def _reset_key_sequence():
+    """Move the ``ShardKey`` sequence past ids inserted explicitly. SQLite's
+    AUTOINCREMENT does this by itself; Postgres sequences do not."""
+    from django.core.management.color import no_style
+    from django.db import connections
+    from .models import ShardKey
+
+    connection = connections[DEFAULT_DB_ALIAS]
+    statements = connection.ops.sequence_reset_sql(no_style(), [ShardKey])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def _seed_keys():
+    """Start the key sequence above every id the shards already use."""
+    from .models import ShardKey
+
+    # Keys recorded by locate() may predate the first allocation, so compare
+    # against the table rather than skip seeding when it has rows
+    highest = (ShardKey.objects.using(DEFAULT_DB_ALIAS).aggregate(top=Max('pk'))['top'] or 0, None)
+    for alias in shards():
+        for model in keyed_models():
+            top = model._base_manager.using(alias).aggregate(top=Max('pk'))['top']
+            if top and top > highest[0]:
+                highest = (top, alias)
+    if highest[1] is not None:
+        ShardKey.objects.using(DEFAULT_DB_ALIAS).get_or_create(pk=highest[0], defaults={'shard': highest[1]})
+    _reset_key_sequence()
+
+
+def allocate_ids(alias, count=1):
+    """Reserve ``count`` new ids for rows about to be written to ``alias``."""
+    from .models import ShardKey
+
+    if not _keys['seeded']:
+        _seed_keys()
+        _keys['seeded'] = True
+    keys = ShardKey.objects.using(DEFAULT_DB_ALIAS).bulk_create([ShardKey(shard=alias) for _ in range(count)])
+    return [key.pk for key in keys]
+
+
+def assign_ids(objs, alias=None):
+    """Give unsaved keyed instances their ids before a ``bulk_create``."""
+    objs = [obj for obj in objs if obj.pk is None]
+    if not sharding_enabled() or not objs:
+        return
+    for obj, pk in zip(objs, allocate_ids(alias or current_shard(), len(objs))):
+        obj.pk = pk
+
+
+def record_keys(ids, alias):
+    """Point ``ids`` at ``alias``, e.g. after their rows moved there."""
+    from .models import ShardKey
+
+    ShardKey.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [ShardKey(pk=pk, shard=alias) for pk in ids],
+        update_conflicts=True, unique_fields=['id'], update_fields=['shard'],
+    )
+    _reset_key_sequence()
+
+
+def replicate_user(user):
+    """Copy ``user``'s row to every other shard."""
+    from copy import copy
+
+    fields = [
+        field.name for field in user._meta.concrete_fields
+        if not field.primary_key
+    ]
+    for alias in shards():
+        if alias == DEFAULT_DB_ALIAS:
+            continue
+        # bulk_create rebinds the instance to the shard, so hand it a copy
+        user.__class__._base_manager.using(alias).bulk_create(
+            [copy(user)], update_conflicts=True, unique_fields=['id'], update_fields=fields,
+        )
+
+
+def remove_user(user):
+    """Delete ``user`` (and what cascades from it) on every other shard."""
+    for alias in shards():
+        if alias != DEFAULT_DB_ALIAS:
+            user.__class__._base_manager.using(alias).filter(pk=user.pk).delete()
@@ -1,10 +1,92 @@
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
+
+from turfs.models import Booking, Slot, Turf, TurfImage
+from .counters import bump
 from .models import Profile
+from .sharding import allocate_ids, remove_user, replicate_user, sharding_enabled
 
 
 @receiver(post_save, sender=User)
 def create_profile(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
+
+
+# -- Admin dashboard counters (bmt.counters) --
+
+@receiver(post_init, sender=Turf)
+def remember_turf_status(sender, instance, **kwargs):
+    # Status as loaded, so post_save can tell whether it moved in or out of
+    # 'pending'. Read from __dict__ so deferred loads don't trigger a query.
+    instance._counted_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Turf)
+def count_saved_turf(sender, instance, created, update_fields, **kwargs):
+    if created:
+        bump('turfs')
+        bump('turfs_pending', int(instance.status == 'pending'))
+    elif update_fields is None or 'status' in update_fields:
+        # An unknown previous status is left for reconcile_counters to correct
+        if instance._counted_status is not None:
+            bump('turfs_pending', int(instance.status == 'pending') - int(instance._counted_status == 'pending'))
+    if update_fields is None or 'status' in update_fields:
+        instance._counted_status = instance.status
+
+
+@receiver(post_delete, sender=Turf)
+def count_deleted_turf(sender, instance, **kwargs):
+    bump('turfs', -1)
+    if instance._counted_status == 'pending':
+        bump('turfs_pending', -1)
+
+
+@receiver(post_save, sender=get_user_model())
+def count_saved_user(sender, instance, created, using, **kwargs):
+    # Copies on the shards are not new users
+    if created and using == DEFAULT_DB_ALIAS:
+        bump('users')
+
+
+@receiver(post_delete, sender=get_user_model())
+def count_deleted_user(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS:
+        bump('users', -1)
+
+
+@receiver(post_save, sender=Booking)
+def count_saved_booking(sender, instance, created, **kwargs):
+    if created:
+        bump('bookings')
+
+
+@receiver(post_delete, sender=Booking)
+def count_deleted_booking(sender, instance, **kwargs):
+    bump('bookings', -1)
+
+
+# -- City shards (bmt.sharding) --
+
+@receiver(post_save, sender=get_user_model())
+def replicate_saved_user(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS and sharding_enabled():
+        replicate_user(instance)
+
+
+@receiver(post_delete, sender=get_user_model())
+def remove_deleted_user(sender, instance, using, **kwargs):
+    if using == DEFAULT_DB_ALIAS and sharding_enabled():
+        remove_user(instance)
+
+
+@receiver(pre_save, sender=Turf)
+@receiver(pre_save, sender=Slot)
+@receiver(pre_save, sender=Booking)
+@receiver(pre_save, sender=TurfImage)
+def assign_shard_key(sender, instance, using, **kwargs):
+    if instance.pk is None and sharding_enabled():
+        instance.pk = allocate_ids(using)[0]
@@ -1,22 +1,106 @@
+import ipaddress
+import logging
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
 from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.contrib import messages
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.db.models import Sum
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_POST
+
+from turfs.listing import LANDING_PAGE_PREFIX, PAGE_CACHE_TIMEOUT
+from turfs.models import Turf, DailyTurfStats
+from .caching import cache_stats, cached_view
+from .decorators import login_required_custom, player_required, owner_required, admin_required
+from .routers import replica_reads
+from .sharding import fan_out, gather
+from .analytics import turf_heatmap
+from .metrics import render as render_metrics
+from .counters import cached_counters
+from .moderation import verify_turfs
+from .exports import iter_export_rows, stream_csv, stream_xlsx
+from .queries import (
+    owner_bookings_page, pending_turfs_page, player_bookings_page, primary_image_prefetch,
+    serialize_owner_booking,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@never_cache
+def healthz(request):
+    """Liveness probe for load balancers: the database answers a query and
+    the cache round-trips a value. Failures are logged, not returned."""
+    healthy = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except DatabaseError:
+        logger.exception("Health check: database query failed")
+        healthy = False
+    try:
+        cache.set('healthz', 1, timeout=10)
+        if cache.get('healthz') != 1:
+            logger.error("Health check: cache did not store a value")
+            healthy = False
+    except Exception:
+        logger.exception("Health check: cache round-trip failed")
+        healthy = False
+    return JsonResponse({'status': 'ok' if healthy else 'error'}, status=200 if healthy else 503)
+
+
+PROXY_HEADERS = ('X-Forwarded-For', 'X-Real-IP', 'Forwarded')
+
 
-from turfs.models import Turf, VerificationDocument, TurfImage
-from .decorators import player_required, owner_required, admin_required
+def _is_local(request):
+    # A front-end proxy on this host connects from loopback on behalf of
+    # remote clients, so proxied requests never count as local
+    if any(header in request.headers for header in PROXY_HEADERS):
+        return False
+    try:
+        return ipaddress.ip_address(request.META.get('REMOTE_ADDR', '')).is_loopback
+    except ValueError:
+        return False
 
-User = get_user_model()
 
+@never_cache
+def metrics(request):
+    """Booking funnel and request metrics in the Prometheus text format.
 
+    Scrapes need ``settings.METRICS_TOKEN`` as a bearer token, or, with no
+    token configured, must come straight from this host.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse(status=401)
+    elif not _is_local(request):
+        return HttpResponse(status=403)
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@cached_view(LANDING_PAGE_PREFIX, PAGE_CACHE_TIMEOUT)
+@replica_reads
 def homepage(request):
     """General landing page for all users."""
-    turfs = Turf.objects.all()[:4]
+    turfs = gather(Turf.objects.prefetch_related(primary_image_prefetch()), 4)
     return render(request, 'homepage.html', {'turfs': turfs})
 
 
 @player_required
+@cached_view(LANDING_PAGE_PREFIX, PAGE_CACHE_TIMEOUT)
+@replica_reads
 def player_home(request):
-    turfs = Turf.objects.all()[:4]
+    turfs = gather(Turf.objects.prefetch_related(primary_image_prefetch()), 4)
     return render(request, 'player_home.html', {'turfs': turfs})
 
 @player_required
@@ -25,63 +109,177 @@ def player_dashboard(request):
 
 
 @owner_required
+@cached_view(LANDING_PAGE_PREFIX, PAGE_CACHE_TIMEOUT)
 def owner_home(request):
-    turfs = Turf.objects.all()[:4]
+    turfs = gather(Turf.objects.prefetch_related(primary_image_prefetch()), 4)
     return render(request, 'owner_home.html', {'turfs': turfs})
 
 @owner_required
 def owner_dashboard(request):
-    owner_turfs = Turf.objects.filter(owner=request.user).order_by('-created_at')
+    owner_turfs = gather(
+        Turf.objects.filter(owner=request.user).order_by('-created_at'),
+        key=lambda turf: turf.created_at, reverse=True,
+    )
+    bookings, next_cursor = owner_bookings_page(request.user)
+
+    # KPIs and charts read the daily rollup rather than raw bookings; the
+    # owner's turfs may sit on several shards, so sums are added up here
+    owner_stats = DailyTurfStats.objects.filter(turf__owner=request.user)
+    totals = Counter()
+    for shard_totals in fan_out(owner_stats.aggregate, bookings=Sum('bookings'), revenue=Sum('paid_revenue')):
+        totals.update({name: value for name, value in shard_totals.items() if value})
+    today = timezone.localdate()
+    chart_start = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+    daily = defaultdict(Counter)
+    for row in gather(
+        owner_stats.filter(date__gte=min(chart_start, today - timedelta(days=14)))
+        .values('date').annotate(bookings=Sum('bookings'), revenue=Sum('paid_revenue')).order_by('date')
+    ):
+        daily[row['date']].update(bookings=row['bookings'], revenue=row['revenue'])
+    daily_stats = [
+        {'date': day.strftime('%Y-%m-%d'), 'bookings': row['bookings'], 'revenue': str(row['revenue'])}
+        for day, row in sorted(daily.items())
+    ]
 
     context = {
         'owner_turfs': owner_turfs,
+        'bookings': bookings,
+        'next_cursor': next_cursor,
+        'total_bookings': totals['bookings'],
+        'total_revenue': totals['revenue'],
+        'daily_stats': daily_stats,
     }
     return render(request, 'ownerdashboard.html', context)
 
 
+@owner_required
+def owner_bookings_feed(request):
+    """JSON page of the owner's bookings; pass ``cursor`` to fetch the next page."""
+    bookings, next_cursor = owner_bookings_page(request.user, cursor=request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [serialize_owner_booking(booking) for booking in bookings],
+        'next_cursor': next_cursor,
+    })
+
+
+@owner_required
+def owner_turf_heatmap(request, turf_id):
+    """Weekday x hour occupancy and revenue matrices for one of the owner's turfs."""
+    turf = get_object_or_404(Turf, id=turf_id, owner=request.user)
+    return JsonResponse(turf_heatmap(turf.id))
+
+
 @player_required
+@replica_reads
 def booking_history(request):
-    bookings = request.user.turf_bookings.all().order_by('-created_at')
-    return render(request, 'bookinghistorypage.html', {'bookings': bookings})
+    before = request.GET.get('before')
+    bookings, next_before = player_bookings_page(request.user, before=before)
+    return render(request, 'bookinghistorypage.html', {
+        'bookings': bookings,
+        'next_before': next_before,
+        'is_first_page': not before,
+    })
 
 @admin_required
 def admin_dashboard(request):
-    from bookings.models import Booking
+    counters = cached_counters()
+    pending, next_after = pending_turfs_page(request.GET.get('after'))
 
     context = {
-        'total_turfs': Turf.objects.count(),
-        'pending_turfs': Turf.objects.filter(status='pending').count(),
-        'total_users': User.objects.count(),
-        'total_bookings': Booking.objects.count(),
-        'pending_verification_list': Turf.objects.filter(status='pending'),
+        'total_turfs': counters['turfs'],
+        'pending_turfs': counters['turfs_pending'],
+        'total_users': counters['users'],
+        'total_bookings': counters['bookings'],
+        'pending_verification_list': pending,
+        'next_after': next_after,
+        'paging': bool(request.GET.get('after')),
     }
     return render(request, 'admindashboard.html', context)
 
 
+@admin_required
+def admin_cache_stats(request):
+    """Cache hits, misses and stale serves per key prefix."""
+    return JsonResponse({'prefixes': cache_stats()})
+
+
 @admin_required
 def admin_verify_turf(request, turf_id):
-    turf = get_object_or_404(Turf, id=turf_id)
+    turf = get_object_or_404(
+        Turf.objects.select_related('verification').prefetch_related('images'),
+        id=turf_id,
+    )
 
     if request.method == 'POST':
         action = request.POST.get('action')
-        if action == 'approve':
-            turf.status = 'approved'
-            turf.rejection_reason = ''
-            turf.save()
-            messages.success(request, f'Turf "{turf.name}" has been approved.')
-        elif action == 'reject':
-            turf.status = 'rejected'
-            turf.rejection_reason = request.POST.get('rejection_reason', '')
-            turf.save()
-            messages.success(request, f'Turf "{turf.name}" has been rejected.')
+        if action in ('approve', 'reject'):
+            reason = request.POST.get('rejection_reason', '') if action == 'reject' else ''
+            verify_turfs([turf.id], action, reason, pending_only=False)
+            verb = 'approved' if action == 'approve' else 'rejected'
+            messages.success(request, f'Turf "{turf.name}" has been {verb}.')
         return redirect('admin_dashboard')
 
-    verification_documents = VerificationDocument.objects.filter(turf=turf).first()
-    turf_images = TurfImage.objects.filter(turf=turf)
-
     context = {
         'turf': turf,
-        'verification_documents': verification_documents,
-        'turf_images': turf_images,
+        'verification_documents': getattr(turf, 'verification', None),
+        'turf_images': turf.images.all(),
     }
     return render(request, 'turfverificationdetail.html', context)
+
+
+@admin_required
+@require_POST
+def admin_bulk_verify(request):
+    """Approve or reject every selected pending turf in one statement."""
+    action = request.POST.get('action')
+    turf_ids = [turf_id for turf_id in request.POST.getlist('turf_ids') if turf_id.isdigit()]
+    if action not in ('approve', 'reject') or not turf_ids:
+        messages.error(request, 'Select at least one turf and an action.')
+    else:
+        reason = request.POST.get('rejection_reason', '').strip() if action == 'reject' else ''
+        updated = verify_turfs(turf_ids, action, reason)
+        verb = 'approved' if action == 'approve' else 'rejected'
+        messages.success(request, f'{updated} turf{"s" if updated != 1 else ""} {verb}.')
+
+    next_after = request.POST.get('after')
+    if next_after and next_after.isdigit():
+        return redirect(f"{reverse('admin_dashboard')}?after={next_after}")
+    return redirect('admin_dashboard')
+
+
+@login_required_custom
+def export_bookings(request):
+    """Stream bookings as CSV or XLSX; owners see their turfs, admins see all."""
+    if request.user.role == 'admin':
+        turfs = Turf.objects.all()
+    elif request.user.role == 'owner':
+        turfs = Turf.objects.filter(owner=request.user)
+    else:
+        return redirect('home')
+
+    turf_id = request.GET.get('turf', '')
+    if turf_id and not turf_id.isdigit():
+        return JsonResponse({'status': 'error', 'message': 'Turf must be a turf id.'}, status=400)
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Dates must be YYYY-MM-DD.'}, status=400)
+
+    if turf_id:
+        turfs = turfs.filter(id=turf_id)
+    # Admins exporting everything need no turf filter
+    turf_ids = None if request.user.role == 'admin' and not turf_id else gather(turfs.values_list('id', flat=True))
+    rows = iter_export_rows(turf_ids, start, end)
+    stamp = timezone.localdate().strftime('%Y%m%d')
+    if request.GET.get('format') == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx(rows),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+        filename = f'bookings-{stamp}.xlsx'
+    else:
+        response = StreamingHttpResponse(stream_csv(rows), content_type='text/csv')
+        filename = f'bookings-{stamp}.csv'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,89 @@
+"""Cache settings from the environment.
+
+``CACHE_URL`` picks the backend of the ``default`` cache and
+``SESSION_CACHE_URL`` that of the ``sessions`` cache:
+
+- ``locmem://name``: memory of one worker process (the default)
+- ``file:///var/tmp/bookmyturf-cache``: a directory shared by the workers
+  of one host
+- ``redis://localhost:6379/0``: a Redis-compatible server shared by all
+  workers (``rediss://`` for TLS); needs the ``redis`` package
+
+Query string parameters are passed through as backend ``OPTIONS``
+(``?MAX_ENTRIES=10000``); ``timeout`` and ``key_prefix`` set ``TIMEOUT`` and
+``KEY_PREFIX``. ``is_shared_cache`` tells whether a cache is seen by every
+worker, and so whether deleting a key there reaches all of them.
+
+``session_backend_from_env`` picks the ``SESSION_BACKEND`` that fits the
+``sessions`` cache.
+"""
+import os
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+# Backends whose contents live in (or vanish with) one worker process
+PER_PROCESS_BACKENDS = {BACKENDS['locmem'], BACKENDS['dummy']}
+
+
+def parse_cache_url(url):
+    """Turn a cache URL into a ``CACHES`` entry."""
+    parts = urlsplit(url)
+    try:
+        backend = BACKENDS[parts.scheme]
+    except KeyError:
+        raise ValueError(f"Unsupported cache URL scheme: {parts.scheme!r}")
+
+    options = dict(parse_qsl(parts.query))
+    cache = {'BACKEND': backend}
+    if 'timeout' in options:
+        timeout = options.pop('timeout')
+        cache['TIMEOUT'] = None if timeout == 'none' else int(timeout)
+    if 'key_prefix' in options:
+        cache['KEY_PREFIX'] = options.pop('key_prefix')
+
+    if parts.scheme == 'locmem':
+        cache['LOCATION'] = parts.netloc
+    elif parts.scheme == 'file':
+        cache['LOCATION'] = unquote(parts.path)
+    elif parts.scheme in ('redis', 'rediss'):
+        # redis-py reads the database number and credentials from the URL itself
+        cache['LOCATION'] = parts._replace(query='', fragment='').geturl()
+    if options:
+        cache['OPTIONS'] = options
+    return cache
+
+
+def cache_from_env(name, default_url, environ=os.environ):
+    """Return the ``CACHES`` entry for ``environ[name]``, or for
+    ``default_url`` when it is unset."""
+    return parse_cache_url(environ.get(name) or default_url)
+
+
+def is_shared_cache(cache):
+    """Whether the ``CACHES`` entry ``cache`` is shared by the workers."""
+    return cache['BACKEND'] not in PER_PROCESS_BACKENDS
+
+
+def session_backend_from_env(backends, sessions_cache, environ=os.environ):
+    """Return the key of ``backends`` named by ``environ['SESSION_BACKEND']``.
+
+    Defaults to ``cached_db`` when ``sessions_cache`` is shared and ``db``
+    otherwise; ``cached_db`` over a per-process cache is refused.
+    """
+    shared = is_shared_cache(sessions_cache)
+    name = environ.get('SESSION_BACKEND') or ('cached_db' if shared else 'db')
+    if name not in backends:
+        raise ImproperlyConfigured(
+            f"Unknown SESSION_BACKEND {name!r}; choose one of {', '.join(backends)}."
+        )
+    if name == 'cached_db' and not shared:
+        raise ImproperlyConfigured("SESSION_BACKEND 'cached_db' needs SESSION_CACHE_URL to name a shared cache.")
+    return name
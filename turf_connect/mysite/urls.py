@@ -20,10 +20,11 @@ from bmt import views as bmt_views
 from accounts import views as accounts_views
 from turfs import views as turf_views
 from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('healthz/', bmt_views.healthz, name='healthz'),
+    path('metrics', bmt_views.metrics, name='metrics'),
 
     # Auth (accounts app)
     path('', bmt_views.homepage, name='home'),
@@ -34,13 +35,19 @@ urlpatterns = [
     path('player/dashboard/', bmt_views.player_dashboard, name='player_dashboard'),
     path('owner/', bmt_views.owner_home, name='owner_home'),
     path('owner/dashboard/', bmt_views.owner_dashboard, name='owner_dashboard'),
-    path('owner/turf/<int:id>/slots/', turf_views.slot_management, name='slot_management'),
+    path('owner/dashboard/bookings/', bmt_views.owner_bookings_feed, name='owner_bookings_feed'),
+    path('owner/turf/<int:turf_id>/slots/', turf_views.slot_management, name='slot_management'),
+    path('owner/turf/<int:turf_id>/heatmap/', bmt_views.owner_turf_heatmap, name='owner_turf_heatmap'),
     path('admin-panel/', bmt_views.admin_dashboard, name='admin_dashboard'),
+    path('admin-panel/cache-stats/', bmt_views.admin_cache_stats, name='admin_cache_stats'),
     path('admin-portal/verification/<int:turf_id>/', bmt_views.admin_verify_turf, name='admin_verify_turf'),
+    path('admin-portal/verification/bulk/', bmt_views.admin_bulk_verify, name='admin_bulk_verify'),
     path('booking-history/', bmt_views.booking_history, name='booking_history'),
+    path('bookings/export/', bmt_views.export_bookings, name='export_bookings'),
 
     # Turfs (turfs app)
     path('turf/', include('turfs.urls')),
-]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+
+    # Uploaded media (ranges, ETags, access checks for verification documents)
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', turf_views.serve_media, name='serve_media'),
+]
\ No newline at end of file
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Turf, TurfImage, VerificationDocument, Slot, Booking, Payment
+from .models import (
+    Turf, TurfImage, VerificationDocument, Slot, Booking, Payment, ArchivedSlot, ArchivedBooking,
+    DailyTurfStats, TurfImageVariant, MediaBlob,
+)
 
 admin.site.register(Turf)
 admin.site.register(TurfImage)
@@ -7,3 +10,8 @@ admin.site.register(VerificationDocument)
 admin.site.register(Slot)
 admin.site.register(Booking)
 admin.site.register(Payment)
+admin.site.register(ArchivedSlot)
+admin.site.register(ArchivedBooking)
+admin.site.register(DailyTurfStats)
+admin.site.register(TurfImageVariant)
+admin.site.register(MediaBlob)
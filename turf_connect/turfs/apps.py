@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class TurfsConfig(AppConfig):
     name = 'turfs'
+
+    def ready(self):
+        import turfs.signals
@@ -0,0 +1,144 @@
+"""Move past slots and finished bookings out of the hot tables.
+
+Rows older than the cutoff are copied into ``ArchivedSlot`` /
+``ArchivedBooking`` (payments and slot links are folded into the booking row)
+and deleted from ``Slot``, ``Booking``, ``Payment`` and the booking-slot link
+table, one batch per transaction. ``iter_booking_history`` streams archived
+and live bookings back together for reporting.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from bmt.counters import batch_counters, suspend_counters
+from bmt.sharding import atomic as shard_atomic
+from .models import ArchivedBooking, ArchivedSlot, Booking, Payment, Slot
+
+
+DEFAULT_ARCHIVE_AFTER_DAYS = 90
+
+
+def archive_cutoff(days=None):
+    """Return the first date that is *not* archived."""
+    if days is None:
+        days = getattr(settings, 'ARCHIVE_AFTER_DAYS', DEFAULT_ARCHIVE_AFTER_DAYS)
+    return timezone.localdate() - timedelta(days=days)
+
+
+def _archive_booking_batch(booking_ids):
+    bookings = list(Booking.objects.filter(id__in=booking_ids))
+    links = {}
+    for booking_id, slot_id in Booking.slots.through.objects.filter(
+        booking_id__in=booking_ids
+    ).values_list('booking_id', 'slot_id'):
+        links.setdefault(booking_id, []).append(slot_id)
+    payments = {}
+    for payment in Payment.objects.filter(booking_id__in=booking_ids).order_by('id'):
+        payments.setdefault(payment.booking_id, []).append({
+            'payment_id': payment.payment_id,
+            'amount': str(payment.amount),
+            'status': payment.status,
+            'created_at': payment.created_at.isoformat(),
+        })
+
+    ArchivedBooking.objects.bulk_create(
+        [
+            ArchivedBooking(
+                booking_id=b.id,
+                player_id=b.player_id,
+                turf_id=b.turf_id,
+                date=b.date,
+                total_amount=b.total_amount,
+                status=b.status,
+                created_at=b.created_at,
+                slot_ids=links.get(b.id, []),
+                payments=payments.get(b.id, []),
+            )
+            for b in bookings
+        ],
+        ignore_conflicts=True,
+    )
+    # Cascades to Payment rows and the slot link table. The bookings now
+    # counted through ArchivedBooking keep their place in the counter.
+    with batch_counters(), suspend_counters('bookings'):
+        Booking.objects.filter(id__in=booking_ids).delete()
+    return len(bookings)
+
+
+def _archive_slot_batch(slot_ids):
+    rows = Slot.objects.filter(id__in=slot_ids).values_list(
+        'id', 'turf_id', 'date', 'start_time', 'end_time', 'price', 'base_price', 'label', 'status'
+    )
+    archived = [
+        ArchivedSlot(
+            slot_id=slot_id, turf_id=turf_id, date=date, start_time=start, end_time=end,
+            price=price, base_price=base_price, label=label, status=status,
+        )
+        for slot_id, turf_id, date, start, end, price, base_price, label, status in rows
+    ]
+    ArchivedSlot.objects.bulk_create(archived, ignore_conflicts=True)
+    Slot.objects.filter(id__in=slot_ids).delete()
+    return len(archived)
+
+
+def _batched_ids(queryset, batch_size):
+    ids = []
+    for pk in queryset.order_by('id').values_list('id', flat=True).iterator(chunk_size=batch_size):
+        ids.append(pk)
+        if len(ids) == batch_size:
+            yield ids
+            ids = []
+    if ids:
+        yield ids
+
+
+def archive_before(cutoff, batch_size=500, dry_run=False):
+    """Archive bookings and slots dated before ``cutoff``.
+
+    Bookings go first so that no live booking ever points at an archived
+    slot. Pending bookings are left alone; the expiry sweep cancels them.
+    Returns ``{'bookings': n, 'slots': n}``.
+    """
+    bookings = Booking.objects.filter(date__lt=cutoff, status__in=('paid', 'cancelled'))
+    # Slots still linked to a live (e.g. pending) booking stay hot
+    slots = Slot.objects.filter(date__lt=cutoff).exclude(turf_bookings__status='pending')
+
+    if dry_run:
+        return {'bookings': bookings.count(), 'slots': slots.count()}
+
+    counts = {'bookings': 0, 'slots': 0}
+    for ids in _batched_ids(bookings, batch_size):
+        with shard_atomic():
+            counts['bookings'] += _archive_booking_batch(ids)
+    for ids in _batched_ids(slots, batch_size):
+        with shard_atomic():
+            counts['slots'] += _archive_slot_batch(ids)
+    return counts
+
+
+def iter_booking_history(turf_ids=None, start=None, end=None, chunk_size=2000):
+    """Yield archived then live bookings as plain dicts, in date order per source.
+
+    ``turf_ids`` limits the bookings to those turfs. Memory use is bounded by
+    ``chunk_size`` regardless of history length.
+    """
+    archived = ArchivedBooking.objects.all()
+    live = Booking.objects.all()
+    if turf_ids is not None:
+        archived = archived.filter(turf_id__in=turf_ids)
+        live = live.filter(turf_id__in=turf_ids)
+    if start is not None:
+        archived = archived.filter(date__gte=start)
+        live = live.filter(date__gte=start)
+    if end is not None:
+        archived = archived.filter(date__lte=end)
+        live = live.filter(date__lte=end)
+
+    fields = ('booking_id', 'player_id', 'turf_id', 'date', 'total_amount', 'status', 'created_at')
+    for row in archived.order_by('date', 'booking_id').values_list(*fields).iterator(chunk_size=chunk_size):
+        yield dict(zip(fields, row), archived=True)
+
+    live_fields = ('id',) + fields[1:]
+    for row in live.order_by('date', 'id').values_list(*live_fields).iterator(chunk_size=chunk_size):
+        yield dict(zip(fields, row), archived=False)
@@ -81,10 +81,18 @@ class AddTurfForm(forms.ModelForm):
             }),
         }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, upload_errors=None, **kwargs):
+        # (field_name, message) pairs reported by TurfUploadHandler
+        self.upload_errors = upload_errors or []
         super().__init__(*args, **kwargs)
         # If editing an existing turf, make doc fields optional
         if self.instance and self.instance.pk:
             self.fields['identity_proof'].required = False
             self.fields['ownership_agreement'].required = False
             self.fields['municipal_permission'].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        for field, message in self.upload_errors:
+            self.add_error(field if field in self.fields else None, message)
+        return cleaned_data
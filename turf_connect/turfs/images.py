@@ -0,0 +1,149 @@
+"""Derived image files for turf photos.
+
+New ``TurfImage`` rows get a set of resized WebP and JPEG variants (card,
+detail, hero) plus the listing thumbnail. Generation is scheduled after the
+upload transaction commits and runs on a background thread; the CPU-bound
+decode/resize/encode step is farmed out to a process pool so it never holds
+the GIL of a request worker.
+"""
+import contextvars
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from bmt.sharding import current_shard
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = (320, 240)
+
+# kind -> bounding box; images are scaled down to fit, never up
+VARIANT_SIZES = {
+    'card': (480, 320),
+    'detail': (1200, 800),
+    'hero': (1920, 1080),
+}
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 78, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+_dispatcher = None
+_process_pool = None
+
+
+def render_variants(source_bytes):
+    """Decode an image and return ``[(kind, format, width, height, data), ...]``.
+
+    Pure function with no Django access, so it can run in a worker process.
+    """
+    results = []
+    with Image.open(BytesIO(source_bytes)) as img:
+        img = ImageOps.exif_transpose(img).convert('RGB')
+        for kind, box in VARIANT_SIZES.items():
+            resized = img.copy()
+            resized.thumbnail(box, Image.LANCZOS)
+            for fmt, (pil_format, options) in VARIANT_FORMATS.items():
+                buffer = BytesIO()
+                resized.save(buffer, format=pil_format, **options)
+                results.append((kind, fmt, resized.width, resized.height, buffer.getvalue()))
+        thumb = ImageOps.fit(img, THUMBNAIL_SIZE, Image.LANCZOS)
+        buffer = BytesIO()
+        thumb.save(buffer, format='JPEG', quality=80, optimize=True)
+        results.append(('thumbnail', 'jpeg', thumb.width, thumb.height, buffer.getvalue()))
+    return results
+
+
+def _get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_PROCESS_WORKERS', None),
+            # Never fork a process that holds DB connections and threads
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _process_pool
+
+
+def _get_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix='turf-images')
+    return _dispatcher
+
+
+def generate_variants(turf_image, use_process_pool=False):
+    """Build and store all variants and the thumbnail for ``turf_image``."""
+    from .models import TurfImageVariant
+
+    with turf_image.image.open('rb') as source:
+        source_bytes = source.read()
+    if use_process_pool:
+        rendered = _get_process_pool().submit(render_variants, source_bytes).result()
+    else:
+        rendered = render_variants(source_bytes)
+
+    stem = os.path.splitext(os.path.basename(turf_image.image.name))[0]
+    turf_image.variants.all().delete()
+    for kind, fmt, width, height, data in rendered:
+        extension = 'jpg' if fmt == 'jpeg' else fmt
+        if kind == 'thumbnail':
+            if turf_image.thumbnail:
+                turf_image.thumbnail.delete(save=False)
+            turf_image.thumbnail.save(f'{stem}_thumb.{extension}', ContentFile(data), save=False)
+            turf_image.save(update_fields=['thumbnail'])
+            continue
+        variant = TurfImageVariant(
+            image=turf_image, kind=kind, format=fmt,
+            width=width, height=height, size_bytes=len(data),
+        )
+        variant.file.save(f'{stem}_{kind}.{extension}', ContentFile(data), save=False)
+        variant.save()
+
+
+def _process_images(image_ids, use_process_pool=False):
+    from .listing import invalidate_browse_listing
+    from .models import TurfImage
+
+    for turf_image in TurfImage.objects.filter(id__in=image_ids):
+        try:
+            generate_variants(turf_image, use_process_pool=use_process_pool)
+        except Exception:
+            # Pages fall back to the original upload; generate_thumbnails can retry
+            logger.exception("Failed to generate variants for turf image %s", turf_image.id)
+    invalidate_browse_listing()
+
+
+def _process_images_in_background(image_ids):
+    close_old_connections()
+    try:
+        _process_images(image_ids, use_process_pool=True)
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(image_ids):
+    """Queue variant generation for ``image_ids`` once the current transaction commits.
+
+    Runs inline when ``settings.IMAGE_VARIANTS_ASYNC`` is False.
+    """
+    image_ids = list(image_ids)
+    if not image_ids:
+        return
+    using = current_shard()
+    if getattr(settings, 'IMAGE_VARIANTS_ASYNC', True):
+        # The background thread looks the images up on the caller's shard
+        context = contextvars.copy_context()
+        transaction.on_commit(
+            lambda: _get_dispatcher().submit(context.run, _process_images_in_background, image_ids),
+            using=using,
+        )
+    else:
+        transaction.on_commit(lambda: _process_images(image_ids), using=using)
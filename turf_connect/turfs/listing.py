@@ -0,0 +1,84 @@
+"""Cached data for the public browse page, turf pages and landing pages.
+
+The browse listing is the same for every visitor, so it is built once and
+kept in the cache until something that changes it happens: a turf is
+approved, rejected or sent back for review, or new photo variants land.
+That also drops the cached browse and landing pages. Callers that change
+many turfs at once invalidate once per batch.
+
+A turf page caches the turf itself; its slots are always read live.
+
+Invalidation only reaches other workers through a shared cache
+(``CACHE_URL``). With the per-process default, entries live for
+``LOCAL_CACHE_TIMEOUT`` seconds and are never served stale, so a turf taken
+down in one worker leaves the others' listings within that time.
+"""
+from bmt.caching import cached, invalidate, invalidate_prefix, is_shared
+
+BROWSE_CACHE_KEY = 'browse-listing'
+BROWSE_CACHE_TIMEOUT = 10 * 60
+TURF_CACHE_TIMEOUT = 10 * 60
+LOCAL_CACHE_TIMEOUT = 30
+
+# Page prefixes for bmt.caching.cached_view
+BROWSE_PAGE_PREFIX = 'browse-page'
+LANDING_PAGE_PREFIX = 'landing'
+PAGE_CACHE_TIMEOUT = 60
+
+
+def _cached(key, build, timeout):
+    if is_shared():
+        return cached(key, build, timeout)
+    return cached(key, build, LOCAL_CACHE_TIMEOUT, stale=0)
+
+
+def build_browse_listing():
+    from bmt.queries import primary_image_prefetch
+    from bmt.sharding import gather
+    from .models import Turf
+
+    turfs = gather(Turf.objects.filter(status="approved").prefetch_related(primary_image_prefetch()))
+
+    data = []
+    for turf in turfs:
+        image = turf.primary_images[0] if turf.primary_images else None
+        data.append({
+            "id": turf.id,
+            "name": turf.name,
+            "city": turf.city,
+            "state": turf.state,
+            "description": turf.description[:120],
+            "locationKey": turf.city.lower(),
+            "price": 1000,
+            "rating": 5.0,
+            "facilities": turf.facilities,
+            "verified": True,
+            "image": image.thumbnail_url if image else "",
+            "srcset": image.srcset('webp') if image else "",
+        })
+    return data
+
+
+def browse_listing():
+    """Return the approved-turf cards for the browse page."""
+    return _cached(BROWSE_CACHE_KEY, build_browse_listing, BROWSE_CACHE_TIMEOUT)
+
+
+def invalidate_browse_listing():
+    invalidate(BROWSE_CACHE_KEY)
+    invalidate_prefix(BROWSE_PAGE_PREFIX, LANDING_PAGE_PREFIX)
+
+
+def approved_turf(turf_id):
+    """Return approved turf ``turf_id`` (or ``None``) for its public page."""
+    from .models import Turf
+
+    return _cached(
+        f'turf:{turf_id}',
+        lambda: Turf.objects.filter(id=turf_id, status='approved').first(),
+        TURF_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_turfs(turf_ids):
+    invalidate(*(f'turf:{turf_id}' for turf_id in turf_ids))
@@ -0,0 +1,26 @@
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+
+from bmt.sharding import fan_out
+from turfs.archive import archive_before, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = "Move past slots and finished bookings into the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Archive rows older than this many days (default: settings.ARCHIVE_AFTER_DAYS).")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows moved per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only count the rows that would be archived.")
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        counts = Counter()
+        for shard_counts in fan_out(archive_before, cutoff, batch_size=options['batch_size'], dry_run=options['dry_run']):
+            counts.update(shard_counts)
+        verb = "Would archive" if options['dry_run'] else "Archived"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {counts['bookings']} bookings and {counts['slots']} slots dated before {cutoff}."
+        ))
@@ -0,0 +1,25 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bmt.sharding import fan_out
+from turfs.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the DailyTurfStats rollup from live and archived history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('turf_ids', nargs='*', type=int, help="Turfs to rebuild (default: all).")
+        parser.add_argument('--start', help="First date to rebuild (YYYY-MM-DD).")
+        parser.add_argument('--end', help="Last date to rebuild (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError:
+            raise CommandError("Dates must be in YYYY-MM-DD format.")
+
+        written = sum(fan_out(rebuild_stats, turf_ids=options['turf_ids'], start=start, end=end))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily stats rows."))
@@ -0,0 +1,104 @@
+import time
+from datetime import time as clock, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from turfs.models import Slot, Turf
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the hold -> summary -> payment -> cancel booking funnel against each "
+        "session backend and compare throughput. All data is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('backends', nargs='*',
+                            help="Keys of settings.SESSION_BACKENDS to compare (default: all).")
+        parser.add_argument('--iterations', type=int, default=100, help="Funnel runs per backend.")
+
+    def handle(self, *args, **options):
+        names = options['backends'] or list(settings.SESSION_BACKENDS)
+        unknown = [name for name in names if name not in settings.SESSION_BACKENDS]
+        if unknown:
+            raise CommandError(f"Unknown session backends: {', '.join(unknown)}")
+
+        for name in names:
+            engine = settings.SESSION_BACKENDS[name]
+            # The funnel's requests go to the test client's host, which a
+            # production ALLOWED_HOSTS would refuse
+            with override_settings(SESSION_ENGINE=engine, RATE_LIMIT_ENABLED=False,
+                                   ALLOWED_HOSTS=['testserver']):
+                result = self.run_funnel(options['iterations'])
+            self.stdout.write(
+                f"{name:15} {result['rate']:8.1f} funnels/s  "
+                f"{result['queries']:6.1f} queries/funnel  "
+                f"{result['session_queries']:5.1f} session-table queries/funnel  "
+                f"cookie {result['cookie_bytes']} bytes"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Compared {len(names)} backends."))
+
+    def run_funnel(self, iterations):
+        result = {}
+        try:
+            with transaction.atomic():
+                User = get_user_model()
+                owner = User.objects.create_user(
+                    email='bench-owner@example.invalid', username='bench-owner',
+                    phone_number='0', role='owner',
+                )
+                player = User.objects.create_user(
+                    email='bench-player@example.invalid', username='bench-player',
+                    phone_number='0', role='player',
+                )
+                turf = Turf.objects.create(
+                    owner=owner, name='Session benchmark', city='Bench', state='Bench',
+                    address='-', description='-', status='approved',
+                )
+                slot = Slot.objects.create(
+                    turf=turf, date=timezone.localdate() + timedelta(days=1),
+                    start_time=clock(18, 0), end_time=clock(19, 0), price=Decimal('1000.00'),
+                )
+
+                client = Client()
+                client.force_login(player)
+                queries = []
+
+                def counter(execute, sql, params, many, context):
+                    queries.append(sql)
+                    return execute(sql, params, many, context)
+
+                with connection.execute_wrapper(counter):
+                    started = time.perf_counter()
+                    for _ in range(iterations):
+                        response = client.post(reverse('hold_slot'), {'slot_id': str(slot.id)})
+                        if response.status_code != 200:
+                            raise CommandError(f"hold_slot failed: {response.content[:200]!r}")
+                        token = {'token': response.json()['booking_token']}
+                        client.get(reverse('booking_summary'), token)
+                        client.get(reverse('payment_page'), token)
+                        client.post(reverse('cancel_booking'), token)
+                    elapsed = time.perf_counter() - started
+
+                cookie = client.cookies.get(settings.SESSION_COOKIE_NAME)
+                result = {
+                    'rate': iterations / elapsed,
+                    'queries': len(queries) / iterations,
+                    'session_queries': sum('django_session' in sql for sql in queries) / iterations,
+                    'cookie_bytes': len(cookie.value) if cookie else 0,
+                }
+                raise _Rollback
+        except _Rollback:
+            pass
+        return result
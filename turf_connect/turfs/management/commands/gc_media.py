@@ -0,0 +1,84 @@
+import os
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from bmt.sharding import per_shard
+from turfs.models import MediaBlob
+from turfs.storage import INCOMING_DIR, is_blob_name
+
+MEDIA_DIRS = ('turf_images', 'verification_docs')
+
+
+def referenced_files():
+    """Count references to every stored file name across all FileFields
+    on every shard."""
+    counts = Counter()
+    for model in apps.get_models():
+        file_fields = [f.name for f in model._meta.get_fields() if isinstance(f, models.FileField)]
+        if not file_fields:
+            continue
+        for rows in per_shard(model._default_manager.values_list(*file_fields)):
+            for row in rows.iterator(chunk_size=2000):
+                counts.update(name for name in row if name)
+    return counts
+
+
+class Command(BaseCommand):
+    help = "Reconcile media blob reference counts and delete unreferenced files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be removed.")
+        parser.add_argument('--include-legacy', action='store_true',
+                            help="Also remove unreferenced files stored before content addressing.")
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        references = referenced_files()
+        root = default_storage.location
+
+        removed = reclaimed = fixed = 0
+        for directory in MEDIA_DIRS:
+            for dirpath, dirnames, filenames in os.walk(os.path.join(root, directory)):
+                for filename in filenames:
+                    full_path = os.path.join(dirpath, filename)
+                    name = os.path.relpath(full_path, root).replace(os.sep, '/')
+                    if references[name]:
+                        continue
+                    if not is_blob_name(name) and not options['include_legacy']:
+                        continue
+                    removed += 1
+                    reclaimed += os.path.getsize(full_path)
+                    self.stdout.write(f"unreferenced: {name}")
+                    if not dry_run:
+                        os.remove(full_path)
+
+        for blob in MediaBlob.objects.iterator(chunk_size=2000):
+            actual = references[blob.name]
+            if actual == blob.refcount:
+                continue
+            fixed += 1
+            if dry_run:
+                continue
+            if actual:
+                MediaBlob.objects.filter(pk=blob.pk).update(refcount=actual)
+            else:
+                blob.delete()
+
+        incoming = os.path.join(root, INCOMING_DIR)
+        if not dry_run and os.path.isdir(incoming):
+            # Leave temp files of uploads that may still be in flight
+            cutoff = time.time() - 60 * 60
+            for filename in os.listdir(incoming):
+                path = os.path.join(incoming, filename)
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+
+        verb = "Would remove" if dry_run else "Removed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {removed} files ({reclaimed / 1024 / 1024:.1f} MB); {fixed} blob refcounts corrected."
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from bmt.sharding import per_shard
+from turfs.images import generate_variants
+from turfs.listing import invalidate_browse_listing
+from turfs.models import TurfImage
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnails and resized variants for turf images that lack them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Regenerate every image.")
+
+    def handle(self, *args, **options):
+        images = TurfImage.objects.all()
+        if not options['all']:
+            images = images.filter(variants__isnull=True).distinct()
+        done = failed = 0
+        for shard_images in per_shard(images):
+            for turf_image in shard_images.iterator(chunk_size=200):
+                try:
+                    generate_variants(turf_image, use_process_pool=True)
+                    done += 1
+                except (OSError, ValueError) as e:
+                    failed += 1
+                    self.stderr.write(f"Image #{turf_image.id}: {e}")
+        invalidate_browse_listing()
+        self.stdout.write(self.style.SUCCESS(f"Processed {done} images ({failed} failed)."))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bmt.sharding import gather, use_shard
+from turfs.models import Turf
+from turfs.pricing import reprice_turf
+
+
+class Command(BaseCommand):
+    help = "Recompute future slot prices from the dynamic pricing rules."
+
+    def add_arguments(self, parser):
+        parser.add_argument('turf_ids', nargs='*', type=int, help="Turfs to reprice (default: all approved turfs).")
+        parser.add_argument('--dry-run', action='store_true', help="Report the revenue delta without writing prices.")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows per bulk update.")
+
+    def handle(self, *args, **options):
+        turfs = Turf.objects.filter(status='approved')
+        if options['turf_ids']:
+            turfs = Turf.objects.filter(id__in=options['turf_ids'])
+        turfs = gather(turfs.order_by('id'), key=lambda turf: turf.id)
+        if options['turf_ids'] and not turfs:
+            raise CommandError("No matching turfs found.")
+
+        total_delta = 0
+        for turf in turfs:
+            started = time.perf_counter()
+            with use_shard(turf._state.db):
+                summary = reprice_turf(turf, dry_run=options['dry_run'], chunk_size=options['chunk_size'])
+            elapsed = time.perf_counter() - started
+            total_delta += summary['revenue_delta']
+            self.stdout.write(
+                f"{turf.name} (#{turf.id}): {summary['changed']}/{summary['slots']} slots changed, "
+                f"₹{summary['current_revenue']} → ₹{summary['projected_revenue']} "
+                f"(delta ₹{summary['revenue_delta']}) in {elapsed:.2f}s"
+            )
+
+        label = "Projected" if options['dry_run'] else "Applied"
+        self.stdout.write(self.style.SUCCESS(f"{label} revenue delta: ₹{total_delta}"))
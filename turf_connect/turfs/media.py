@@ -0,0 +1,192 @@
+"""Serving uploaded media.
+
+``media_response`` answers a request for a stored file with strong ETags,
+conditional and single-range (``206``) responses, and cache headers that
+depend on the file: content-addressed blobs never change, so they are cached
+for a year as ``immutable``; verification documents are ``private``.
+
+With ``settings.MEDIA_SENDFILE_BACKEND`` set to ``'x-sendfile'`` (Apache,
+lighttpd) or ``'x-accel-redirect'`` (nginx) the body is left to the front-end
+server, which then also handles ranges.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .storage import is_blob_name
+
+PROTECTED_DIRS = ('verification_docs/',)
+DOCUMENT_FIELDS = ('identity_proof', 'ownership_agreement', 'municipal_permission', 'gst_certificate')
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def clean_name(path):
+    """Normalise a requested media path, refusing anything that escapes
+    ``MEDIA_ROOT`` or points into a hidden directory such as ``.incoming``."""
+    name = posixpath.normpath(path.replace('\\', '/')).lstrip('/')
+    if any(part.startswith('.') for part in name.split('/')):
+        raise Http404("Media file not found.")
+    return name
+
+
+def is_protected(name):
+    return name.startswith(PROTECTED_DIRS)
+
+
+def can_view(user, name):
+    """Public media is open to everyone; verification documents only to
+    admins and the owner of the turf they belong to."""
+    from .models import VerificationDocument
+
+    if not is_protected(name):
+        return True
+    if not user.is_authenticated:
+        return False
+    if user.role == 'admin':
+        return True
+    if user.role != 'owner':
+        return False
+    matches_name = Q()
+    for field in DOCUMENT_FIELDS:
+        matches_name |= Q(**{field: name})
+    return VerificationDocument.objects.filter(matches_name, turf__owner=user).exists()
+
+
+def file_etag(name, stat):
+    """Content-addressed blobs are tagged with their hash, other files with
+    their mtime and size."""
+    if is_blob_name(name):
+        return quote_etag(os.path.splitext(os.path.basename(name))[0])
+    return quote_etag(f'{stat.st_mtime_ns:x}-{stat.st_size:x}')
+
+
+def cache_control(name):
+    if is_protected(name):
+        scope = 'private'
+    else:
+        scope = 'public'
+    if is_blob_name(name):
+        return f'{scope}, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'{scope}, max-age={getattr(settings, "MEDIA_CACHE_MAX_AGE", 3600)}'
+
+
+def parse_range(header, size):
+    """Return ``(start, end)`` (inclusive) for a single byte range.
+
+    ``None`` means the header should be ignored and the whole file sent
+    (missing, malformed or multi-range); ``ValueError`` means the range
+    cannot be satisfied.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def _sendfile_response(name, path, content_type):
+    backend = getattr(settings, 'MEDIA_SENDFILE_BACKEND', None)
+    # The front-end server fills in the body and its length
+    if backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    elif backend == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        prefix = getattr(settings, 'MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + name
+    else:
+        return None
+    return response
+
+
+def _file_response(request, path, size, etag, content_type):
+    byte_range = None
+    if request.method in ('GET', 'HEAD'):
+        if_range = request.headers.get('If-Range')
+        # A stale If-Range (or one with a date) falls back to the full file
+        if not if_range or if_range == etag:
+            try:
+                byte_range = parse_range(request.headers.get('Range'), size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+
+    if byte_range is None:
+        return FileResponse(open(path, 'rb'), content_type=content_type)
+
+    start, end = byte_range
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        _read_range(path, start, length), status=206, content_type=content_type,
+    )
+    response['Content-Length'] = str(length)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
+
+
+def media_response(request, name):
+    """Build the response for stored file ``name`` (already permission-checked)."""
+    try:
+        path = default_storage.path(name)
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        raise Http404("Media file not found.")
+    if not os.path.isfile(path):
+        raise Http404("Media file not found.")
+
+    etag = file_etag(name, stat)
+    last_modified = http_date(stat.st_mtime)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(stat.st_mtime),
+    )
+    if response is None:
+        response = _sendfile_response(name, path, content_type)
+    if response is None:
+        response = _file_response(request, path, stat.st_size, etag, content_type)
+
+    if response.status_code in (200, 206, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+        response['Cache-Control'] = cache_control(name)
+    response['Accept-Ranges'] = 'bytes'
+    return response
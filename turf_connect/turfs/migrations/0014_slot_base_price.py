@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turfs', '0013_remove_turf_opening_time_remove_turf_turf_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slot',
+            name='base_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+    ]
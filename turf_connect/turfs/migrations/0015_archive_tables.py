@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turfs', '0014_slot_base_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_id', models.IntegerField(unique=True)),
+                ('player_id', models.IntegerField(db_index=True)),
+                ('turf_id', models.IntegerField(db_index=True)),
+                ('date', models.DateField(db_index=True)),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('status', models.CharField(max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('slot_ids', models.JSONField(default=list)),
+                ('payments', models.JSONField(default=list)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedSlot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot_id', models.IntegerField(unique=True)),
+                ('turf_id', models.IntegerField(db_index=True)),
+                ('date', models.DateField(db_index=True)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('status', models.CharField(max_length=20)),
+            ],
+        ),
+    ]
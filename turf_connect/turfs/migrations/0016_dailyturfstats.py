@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turfs', '0015_archive_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTurfStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('cancelled', models.PositiveIntegerField(default=0)),
+                ('slots_offered', models.PositiveIntegerField(default=0)),
+                ('slots_booked', models.PositiveIntegerField(default=0)),
+                ('occupancy', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('turf', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='turfs.turf')),
+            ],
+            options={
+                'unique_together': {('turf', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turfs', '0016_dailyturfstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='turfimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, upload_to='turf_images/thumbs/'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('turfs', '0019_mediablob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedslot',
+            name='base_price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True),
+        ),
+        migrations.AddField(
+            model_name='archivedslot',
+            name='label',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+    ]
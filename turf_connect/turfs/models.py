@@ -53,6 +53,8 @@ class Slot(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     price = models.DecimalField(max_digits=8, decimal_places=2)
+    # Owner-set price that dynamic pricing rules are applied to
+    base_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     label = models.CharField(max_length=100, blank=True, default='')
     is_booked = models.BooleanField(default=False)
     status = models.CharField(
@@ -84,10 +86,60 @@ class TurfImage(models.Model):
         related_name='images',
     )
     image = models.ImageField(upload_to='turf_images/')
+    thumbnail = models.ImageField(upload_to='turf_images/thumbs/', blank=True)
 
     def __str__(self):
         return f"Image for {self.turf.name}"
 
+    @property
+    def thumbnail_url(self):
+        """URL of the pre-generated thumbnail, falling back to the original upload."""
+        if self.thumbnail:
+            return self.thumbnail.url
+        return self.image.url
+
+    def srcset(self, image_format='webp'):
+        """``srcset`` value listing every generated variant in ``image_format``.
+
+        Uses prefetched ``variants`` when available.
+        """
+        variants = sorted(
+            (v for v in self.variants.all() if v.format == image_format),
+            key=lambda v: v.width,
+        )
+        return ', '.join(f"{v.file.url} {v.width}w" for v in variants)
+
+
+class TurfImageVariant(models.Model):
+    """A resized, re-encoded copy of a ``TurfImage`` for responsive pages."""
+
+    class Kind(models.TextChoices):
+        CARD = 'card', 'Card'
+        DETAIL = 'detail', 'Detail'
+        HERO = 'hero', 'Hero'
+
+    class Format(models.TextChoices):
+        WEBP = 'webp', 'WebP'
+        JPEG = 'jpeg', 'JPEG'
+
+    image = models.ForeignKey(
+        TurfImage,
+        on_delete=models.CASCADE,
+        related_name='variants',
+    )
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    format = models.CharField(max_length=10, choices=Format.choices)
+    file = models.ImageField(upload_to='turf_images/variants/')
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    size_bytes = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('image', 'kind', 'format')
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.format} ({self.width}x{self.height}) for image {self.image_id}"
+
 
 class VerificationDocument(models.Model):
     """Government verification documents for a turf listing."""
@@ -155,3 +207,79 @@ class Payment(models.Model):
 
     def __str__(self):
         return f"Payment {self.payment_id} | {self.status} | ₹{self.amount}"
+
+
+class ArchivedSlot(models.Model):
+    """Compact copy of a past slot moved out of the hot ``Slot`` table."""
+
+    slot_id = models.IntegerField(unique=True)
+    turf_id = models.IntegerField(db_index=True)
+    date = models.DateField(db_index=True)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    base_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    label = models.CharField(max_length=100, blank=True, default='')
+    status = models.CharField(max_length=20)
+
+    def __str__(self):
+        return f"Archived slot {self.slot_id} | {self.date} {self.start_time}"
+
+
+class ArchivedBooking(models.Model):
+    """Compact copy of a finished booking, its slot links and payments."""
+
+    booking_id = models.IntegerField(unique=True)
+    player_id = models.IntegerField(db_index=True)
+    turf_id = models.IntegerField(db_index=True)
+    date = models.DateField(db_index=True)
+    total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    status = models.CharField(max_length=20)
+    created_at = models.DateTimeField()
+    # Former Booking.slots M2M rows, as a list of slot ids
+    slot_ids = models.JSONField(default=list)
+    # Former Payment rows: [{"payment_id", "amount", "status", "created_at"}, ...]
+    payments = models.JSONField(default=list)
+
+    def __str__(self):
+        return f"Archived booking {self.booking_id} | {self.date} ({self.status})"
+
+
+class DailyTurfStats(models.Model):
+    """Per-turf, per-day booking and occupancy rollup for owner dashboards.
+
+    Maintained incrementally by ``turfs.stats`` as bookings are paid,
+    cancelled or expire; ``manage.py backfill_turf_stats`` rebuilds it.
+    """
+
+    turf = models.ForeignKey(
+        Turf,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+    )
+    date = models.DateField()
+    bookings = models.PositiveIntegerField(default=0)
+    paid_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    cancelled = models.PositiveIntegerField(default=0)
+    slots_offered = models.PositiveIntegerField(default=0)
+    slots_booked = models.PositiveIntegerField(default=0)
+    occupancy = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('turf', 'date')
+
+    def __str__(self):
+        return f"{self.turf_id} | {self.date}: {self.bookings} bookings, ₹{self.paid_revenue}"
+
+
+class MediaBlob(models.Model):
+    """A deduplicated uploaded file and how many file fields reference it."""
+
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
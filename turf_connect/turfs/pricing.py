@@ -0,0 +1,174 @@
+"""Rule-based dynamic pricing for future slots.
+
+Prices are recomputed from each slot's ``base_price`` (the price the owner
+set when the slot was generated) so repeated runs never compound. Rules are
+evaluated over NumPy columns of the whole future inventory of a turf at once
+and the changed rows are written back with chunked ``bulk_update`` calls.
+"""
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from bmt.sharding import atomic as shard_atomic
+from .models import Slot
+
+
+DEFAULT_PRICING_RULES = {
+    # (start, end) windows as 'HH:MM' strings, matched on slot start time
+    'peak_hours': [('18:00', '23:00')],
+    'peak_multiplier': 1.20,
+    'weekend_multiplier': 1.15,
+    # ISO dates, e.g. ['2026-10-20', '2026-11-08']
+    'holidays': [],
+    'holiday_multiplier': 1.25,
+    # Discount applied to still-available slots starting within this window
+    'last_minute_hours': 3,
+    'last_minute_multiplier': 0.85,
+    # Surge once this fraction of a day's slots is held or booked
+    'surge_occupancy': 0.70,
+    'surge_multiplier': 1.10,
+    'min_multiplier': 0.50,
+    'max_multiplier': 2.00,
+    'round_to': 10,
+}
+
+
+def get_pricing_rules(overrides=None):
+    """Merge the defaults, ``settings.SLOT_PRICING_RULES`` and ``overrides``."""
+    rules = dict(DEFAULT_PRICING_RULES)
+    rules.update(getattr(settings, 'SLOT_PRICING_RULES', {}))
+    if overrides:
+        rules.update(overrides)
+    return rules
+
+
+def _money(value):
+    return Decimal(str(round(float(value), 2))).quantize(Decimal('0.01'))
+
+
+def _to_minutes(hhmm):
+    hours, minutes = hhmm.split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def compute_prices(base, date_ord, start_min, occupancy, now_ord, now_min, rules):
+    """Return the new price for every slot as a float array.
+
+    All arguments except ``now_ord``, ``now_min`` and ``rules`` are
+    equal-length 1-D arrays: base price, ``date.toordinal()`` of the slot,
+    start time in minutes after midnight, and the held/booked fraction of the
+    slot's day.
+    """
+    multiplier = np.ones(base.shape[0], dtype=np.float64)
+
+    peak = np.zeros(base.shape[0], dtype=bool)
+    for start, end in rules['peak_hours']:
+        peak |= (start_min >= _to_minutes(start)) & (start_min < _to_minutes(end))
+    multiplier[peak] *= rules['peak_multiplier']
+
+    # date(1, 1, 1) has ordinal 1 and is a Monday
+    weekday = (date_ord - 1) % 7
+    multiplier[weekday >= 5] *= rules['weekend_multiplier']
+
+    if rules['holidays']:
+        holiday_ords = np.array(
+            [date.fromisoformat(d).toordinal() for d in rules['holidays']],
+            dtype=np.int64,
+        )
+        multiplier[np.isin(date_ord, holiday_ords)] *= rules['holiday_multiplier']
+
+    minutes_ahead = (date_ord - now_ord) * 1440 + (start_min - now_min)
+    last_minute = minutes_ahead <= rules['last_minute_hours'] * 60
+    multiplier[last_minute] *= rules['last_minute_multiplier']
+
+    multiplier[occupancy >= rules['surge_occupancy']] *= rules['surge_multiplier']
+
+    np.clip(multiplier, rules['min_multiplier'], rules['max_multiplier'], out=multiplier)
+
+    prices = base * multiplier
+    step = rules['round_to']
+    if step:
+        # Prices no rule touched stay exactly as the owner set them
+        adjusted = multiplier != 1.0
+        prices[adjusted] = np.round(prices[adjusted] / step) * step
+    return np.round(prices, 2)
+
+
+def reprice_turf(turf, rules=None, dry_run=False, chunk_size=1000):
+    """Recompute prices for all future, available slots of ``turf``.
+
+    Held and booked slots keep their price but still count towards the
+    occupancy of their day. Returns a summary dict with the number of slots
+    considered and changed, and the listed revenue before and after.
+    """
+    rules = get_pricing_rules(rules)
+    now = timezone.localtime()
+    today = now.date()
+
+    rows = list(
+        Slot.objects.filter(
+            Q(turf=turf),
+            Q(date__gt=today) | Q(date=today, end_time__gt=now.time())
+        ).values_list('id', 'date', 'start_time', 'status', 'price', 'base_price')
+    )
+    summary = {
+        'slots': 0,
+        'changed': 0,
+        'current_revenue': Decimal('0.00'),
+        'projected_revenue': Decimal('0.00'),
+        'revenue_delta': Decimal('0.00'),
+    }
+    if not rows:
+        return summary
+
+    ids, dates, starts, statuses, prices, bases = zip(*rows)
+    ids = np.fromiter(ids, dtype=np.int64, count=len(rows))
+    date_ord = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(rows))
+    start_min = np.fromiter((t.hour * 60 + t.minute for t in starts), dtype=np.int64, count=len(rows))
+    price = np.array(prices, dtype=np.float64)
+    base = np.array([p if b is None else b for p, b in zip(prices, bases)], dtype=np.float64)
+    available = np.array(statuses) == 'available'
+
+    # Occupancy of each slot's day: taken slots / all slots on that date
+    day_keys, day_index = np.unique(date_ord, return_inverse=True)
+    taken_per_day = np.bincount(day_index, weights=(~available).astype(np.float64), minlength=day_keys.shape[0])
+    total_per_day = np.bincount(day_index, minlength=day_keys.shape[0])
+    occupancy = (taken_per_day / total_per_day)[day_index]
+
+    new_price = compute_prices(
+        base, date_ord, start_min, occupancy,
+        today.toordinal(), now.hour * 60 + now.minute, rules,
+    )
+    new_price = np.where(available, new_price, price)
+    missing_base = np.fromiter((b is None for b in bases), dtype=bool, count=len(rows))
+    changed = available & ((new_price != price) | missing_base)
+
+    summary['slots'] = int(available.sum())
+    summary['changed'] = int(changed.sum())
+    summary['current_revenue'] = _money(price[available].sum())
+    summary['projected_revenue'] = _money(new_price[available].sum())
+    summary['revenue_delta'] = summary['projected_revenue'] - summary['current_revenue']
+
+    if dry_run or not summary['changed']:
+        return summary
+
+    changed_idx = np.flatnonzero(changed)
+    with shard_atomic():
+        for offset in range(0, changed_idx.shape[0], chunk_size):
+            chunk = changed_idx[offset:offset + chunk_size]
+            Slot.objects.bulk_update(
+                [
+                    Slot(
+                        id=int(ids[i]),
+                        price=_money(new_price[i]),
+                        base_price=_money(base[i]),
+                    )
+                    for i in chunk
+                ],
+                ['price', 'base_price'],
+            )
+    return summary
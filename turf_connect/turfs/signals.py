@@ -0,0 +1,46 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bmt.caching import invalidate_prefix
+from .listing import LANDING_PAGE_PREFIX, invalidate_turfs
+from .models import Turf, TurfImage, TurfImageVariant, VerificationDocument
+
+
+def release_files(*fieldfiles, using=None):
+    """Drop the storage reference held by each non-empty FieldFile once the
+    transaction on ``using`` commits, so a rolled-back delete keeps its files."""
+    for fieldfile in fieldfiles:
+        if fieldfile:
+            transaction.on_commit(partial(fieldfile.storage.delete, fieldfile.name), using=using)
+
+
+@receiver(post_delete, sender=TurfImage)
+def release_turf_image_files(sender, instance, using, **kwargs):
+    release_files(instance.image, instance.thumbnail, using=using)
+
+
+@receiver(post_delete, sender=TurfImageVariant)
+def release_variant_file(sender, instance, using, **kwargs):
+    release_files(instance.file, using=using)
+
+
+@receiver(post_delete, sender=VerificationDocument)
+def release_verification_files(sender, instance, using, **kwargs):
+    release_files(
+        instance.identity_proof,
+        instance.ownership_agreement,
+        instance.municipal_permission,
+        instance.gst_certificate,
+        using=using,
+    )
+
+
+@receiver(post_save, sender=Turf)
+@receiver(post_delete, sender=Turf)
+def invalidate_cached_turf(sender, instance, **kwargs):
+    # Landing pages list the newest turfs whatever their status
+    invalidate_turfs([instance.pk])
+    invalidate_prefix(LANDING_PAGE_PREFIX)
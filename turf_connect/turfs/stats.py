@@ -0,0 +1,113 @@
+"""Incremental maintenance of the ``DailyTurfStats`` rollup.
+
+Booking events bump counters with ``F()`` expressions; slot counts for the
+affected turf/day are recomputed with one small aggregate. ``rebuild_stats``
+regenerates rows from live and archived history.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum
+
+from bmt.sharding import atomic as shard_atomic
+from .models import ArchivedBooking, ArchivedSlot, Booking, DailyTurfStats, Slot, Turf
+
+
+def _occupancy(slots_booked, slots_offered):
+    if not slots_offered:
+        return Decimal('0.00')
+    return (Decimal(slots_booked) * 100 / slots_offered).quantize(Decimal('0.01'))
+
+
+def _bump(turf_id, date, **increments):
+    DailyTurfStats.objects.get_or_create(turf_id=turf_id, date=date)
+    DailyTurfStats.objects.filter(turf_id=turf_id, date=date).update(
+        **{field: F(field) + value for field, value in increments.items()}
+    )
+
+
+def refresh_slot_counts(turf_id, date):
+    """Recompute offered/booked slot counts and occupancy for one turf-day."""
+    counts = Slot.objects.filter(turf_id=turf_id, date=date).aggregate(
+        offered=Count('id'),
+        booked=Count('id', filter=Q(status='booked')),
+    )
+    DailyTurfStats.objects.update_or_create(
+        turf_id=turf_id,
+        date=date,
+        defaults={
+            'slots_offered': counts['offered'],
+            'slots_booked': counts['booked'],
+            'occupancy': _occupancy(counts['booked'], counts['offered']),
+        },
+    )
+
+
+def record_payment(booking):
+    """Count a booking that has just been paid."""
+    with shard_atomic():
+        _bump(booking.turf_id, booking.date, bookings=1, paid_revenue=booking.total_amount)
+        refresh_slot_counts(booking.turf_id, booking.date)
+
+
+def record_cancellation(booking):
+    """Count a pending booking that was cancelled or expired."""
+    _bump(booking.turf_id, booking.date, cancelled=1)
+
+
+def rebuild_stats(turf_ids=None, start=None, end=None):
+    """Rebuild rollup rows from live and archived bookings and slots.
+
+    Returns the number of rows written.
+    """
+    filters = Q()
+    if turf_ids:
+        filters &= Q(turf_id__in=turf_ids)
+    if start:
+        filters &= Q(date__gte=start)
+    if end:
+        filters &= Q(date__lte=end)
+
+    rows = defaultdict(lambda: {
+        'bookings': 0, 'paid_revenue': Decimal('0.00'), 'cancelled': 0,
+        'slots_offered': 0, 'slots_booked': 0,
+    })
+
+    for model in (Booking, ArchivedBooking):
+        aggregates = model.objects.filter(filters).values('turf_id', 'date').annotate(
+            paid=Count('pk', filter=Q(status='paid')),
+            revenue=Sum('total_amount', filter=Q(status='paid')),
+            cancelled=Count('pk', filter=Q(status='cancelled')),
+        )
+        for item in aggregates:
+            row = rows[(item['turf_id'], item['date'])]
+            row['bookings'] += item['paid']
+            row['paid_revenue'] += item['revenue'] or 0
+            row['cancelled'] += item['cancelled']
+
+    for model in (Slot, ArchivedSlot):
+        aggregates = model.objects.filter(filters).values('turf_id', 'date').annotate(
+            offered=Count('pk'),
+            booked=Count('pk', filter=Q(status='booked')),
+        )
+        for item in aggregates:
+            row = rows[(item['turf_id'], item['date'])]
+            row['slots_offered'] += item['offered']
+            row['slots_booked'] += item['booked']
+
+    # Archived rows may outlive their turf
+    existing_turfs = set(Turf.objects.values_list('id', flat=True))
+    objects = [
+        DailyTurfStats(
+            turf_id=turf_id,
+            date=date,
+            occupancy=_occupancy(values['slots_booked'], values['slots_offered']),
+            **values,
+        )
+        for (turf_id, date), values in rows.items()
+        if turf_id in existing_turfs
+    ]
+    with shard_atomic():
+        DailyTurfStats.objects.filter(filters).delete()
+        DailyTurfStats.objects.bulk_create(objects, batch_size=1000)
+    return len(objects)
@@ -0,0 +1,99 @@
+"""Content-addressed, deduplicated media storage.
+
+Uploads are hashed (SHA-256) while they are streamed to a temporary file and
+stored once as ``<upload_to>/<hh>/<sha256><ext>``. A ``MediaBlob`` row counts
+how many file fields point at each blob; ``delete()`` only removes the file
+when the last reference goes away. ``manage.py gc_media`` reconciles the
+counts with the database and removes unreferenced blobs.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+BLOB_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.[A-Za-z0-9]+)?$')
+INCOMING_DIR = '.incoming'
+
+
+def is_blob_name(name):
+    return bool(BLOB_NAME_RE.search(name or ''))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save(), so the
+        # upload name never needs a uniquifying suffix.
+        return name
+
+    def _save(self, name, content):
+        from .models import MediaBlob
+
+        incoming = os.path.join(self.location, INCOMING_DIR)
+        os.makedirs(incoming, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=incoming)
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode('utf-8')
+                    digest.update(chunk)
+                    size += len(chunk)
+                    temp_file.write(chunk)
+
+            sha256 = digest.hexdigest()
+            directory, filename = os.path.split(name)
+            extension = os.path.splitext(filename)[1].lower()
+            blob_name = '/'.join(filter(None, [directory, sha256[:2], sha256 + extension]))
+            full_path = self.path(blob_name)
+
+            # The row lock orders this against a delete() of the same blob,
+            # which removes the file while holding it
+            with transaction.atomic():
+                blob = MediaBlob.objects.select_for_update().filter(name=blob_name).first()
+                if blob is None:
+                    MediaBlob.objects.create(name=blob_name, sha256=sha256, size=size, refcount=1)
+                else:
+                    MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') + 1)
+                if not os.path.exists(full_path):
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    os.replace(temp_path, full_path)
+                    temp_path = None
+                    if self.file_permissions_mode is not None:
+                        os.chmod(full_path, self.file_permissions_mode)
+        finally:
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+        return blob_name
+
+    def delete(self, name):
+        """Drop one reference to ``name``; remove the file with the last one.
+
+        Files that predate this storage (no ``MediaBlob`` row) are deleted
+        directly.
+        """
+        from .models import MediaBlob
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+        if not is_blob_name(name):
+            return super().delete(name)
+
+        with transaction.atomic():
+            blob = MediaBlob.objects.select_for_update().filter(name=name).first()
+            if blob is None:
+                return
+            if blob.refcount > 1:
+                MediaBlob.objects.filter(pk=blob.pk).update(refcount=F('refcount') - 1)
+                return
+            blob.delete()
+            super().delete(name)
@@ -0,0 +1,27 @@
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+@register.simple_tag
+def turf_picture(turf_image, alt='', sizes='(max-width: 600px) 100vw, 480px', css_class=''):
+    """Render a ``<picture>`` with WebP and JPEG ``srcset`` for a TurfImage.
+
+    Falls back to the thumbnail (or original upload) until variants exist.
+    Expects ``variants`` to be prefetched.
+    """
+    if turf_image is None:
+        return ''
+    webp = turf_image.srcset('webp')
+    jpeg = turf_image.srcset('jpeg')
+    if not webp:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+            turf_image.thumbnail_url, alt, css_class,
+        )
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async"></picture>',
+        webp, sizes, turf_image.thumbnail_url, jpeg, sizes, alt, css_class,
+    )
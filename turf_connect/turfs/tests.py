@@ -1,3 +1,617 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
+from datetime import date, time, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from accounts.models import User
+from bmt.sharding import atomic as shard_atomic
+from . import listing
+from .archive import archive_before
+from .images import generate_variants, render_variants, schedule_variants
+from .media import parse_range
+from .models import (
+    ArchivedSlot, Booking, DailyTurfStats, MediaBlob, Payment, Slot, Turf, TurfImage, TurfImageVariant,
+    VerificationDocument,
+)
+from .pricing import compute_prices, get_pricing_rules
+from .signals import release_files
+from .stats import refresh_slot_counts
+from .storage import ContentAddressedStorage
+from .tokens import make_booking_token, read_booking_token
+from .views import expire_pending_bookings
+from .uploadhandlers import TurfUploadHandler
+
+
+def make_turf(**fields):
+    owner = User.objects.create_user(
+        username='owner', email='owner@example.com', password=None,
+        phone_number='9999999999', role=User.Role.OWNER,
+    )
+    fields = {
+        'name': 'Arena', 'city': 'Pune', 'state': 'MH', 'address': 'Road 1',
+        'description': 'Five-a-side', **fields,
+    }
+    return Turf.objects.create(owner=owner, **fields)
+
+
+class ContentAddressedStorageTests(TestCase):
+
+    def setUp(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        self.storage = ContentAddressedStorage(location=location)
+
+    def save(self, content=b'pitch photo'):
+        return self.storage.save('turf_images/photo.JPG', ContentFile(content))
+
+    def test_same_content_is_stored_once(self):
+        first, second = self.save(), self.save()
+        self.assertEqual(first, second)
+        self.assertTrue(first.endswith('.jpg'))
+        self.assertEqual(MediaBlob.objects.get(name=first).refcount, 2)
+
+    def test_file_goes_with_the_last_reference(self):
+        name = self.save()
+        self.save()
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(MediaBlob.objects.filter(name=name).exists())
+
+    def test_saving_again_after_the_last_delete(self):
+        name = self.save()
+        self.storage.delete(name)
+        self.assertEqual(self.save(), name)
+        self.assertTrue(os.path.exists(self.storage.path(name)))
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 1)
+
+    def test_release_waits_for_commit(self):
+        name = self.save()
+        fieldfile = SimpleNamespace(name=name, storage=self.storage)
+        with self.captureOnCommitCallbacks() as callbacks:
+            release_files(fieldfile)
+            self.assertTrue(self.storage.exists(name))
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertFalse(self.storage.exists(name))
+
+
+class ComputePricesTests(TestCase):
+    # 2026-10-19 is a Monday
+    today = date(2026, 10, 19).toordinal()
+
+    def prices(self, base, day, start_min, occupancy=0.0, **rules):
+        return compute_prices(
+            np.array([base], dtype=np.float64),
+            np.array([self.today + day], dtype=np.int64),
+            np.array([start_min], dtype=np.int64),
+            np.array([occupancy], dtype=np.float64),
+            self.today, 8 * 60, get_pricing_rules(rules),
+        )[0]
+
+    def test_untouched_price_is_not_rounded(self):
+        self.assertEqual(self.prices(805, day=1, start_min=10 * 60), 805)
+
+    def test_peak_hours(self):
+        self.assertEqual(self.prices(800, day=1, start_min=19 * 60), 960)
+
+    def test_weekend_and_peak_compound(self):
+        # Saturday evening: 800 * 1.20 * 1.15 = 1104, rounded to 1100
+        self.assertEqual(self.prices(800, day=5, start_min=19 * 60), 1100)
+
+    def test_holiday(self):
+        self.assertEqual(self.prices(800, day=2, start_min=10 * 60, holidays=['2026-10-21']), 1000)
+
+    def test_last_minute_discount(self):
+        self.assertEqual(self.prices(800, day=0, start_min=10 * 60), 680)
+
+    def test_surge(self):
+        self.assertEqual(self.prices(800, day=1, start_min=10 * 60, occupancy=0.75), 880)
+
+    def test_multiplier_is_clipped(self):
+        self.assertEqual(self.prices(800, day=1, start_min=19 * 60, peak_multiplier=5), 1600)
+
+
+class PendingBookingRaceTests(TestCase):
+    """A booking settled by another request between the view's status check
+    and its write must be left alone."""
+
+    def setUp(self):
+        turf = make_turf()
+        self.player = User.objects.create_user(
+            username='player', email='player@example.com', password=None, phone_number='8888888888',
+        )
+        self.slot = Slot.objects.create(
+            turf=turf, date=date.today() + timedelta(days=1), start_time=time(6), end_time=time(7),
+            price=Decimal('800'), status='held',
+        )
+        self.booking = Booking.objects.create(
+            player=self.player, turf=turf, date=self.slot.date, total_amount=Decimal('800'),
+            status='pending', expires_at=timezone.now() + timedelta(minutes=10),
+        )
+        self.booking.slots.add(self.slot)
+        self.client.force_login(self.player)
+
+    def settled_first(self, **kwargs):
+        Booking.objects.filter(pk=self.booking.pk).update(status='paid')
+        return shard_atomic(**kwargs)
+
+    def post(self, name):
+        with mock.patch('turfs.views.shard_atomic', self.settled_first):
+            return self.client.post(reverse(name), {'token': make_booking_token(self.booking)})
+
+    def test_payment_of_a_settled_booking(self):
+        self.post('payment_process')
+        self.assertFalse(Payment.objects.exists())
+
+    def test_cancel_of_a_settled_booking(self):
+        self.post('cancel_booking')
+        self.booking.refresh_from_db()
+        self.slot.refresh_from_db()
+        self.assertEqual(self.booking.status, 'paid')
+        self.assertEqual(self.slot.status, 'held')
+
+
+class ApprovedTurfCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.turf = make_turf(status='approved')
+
+    def ttl(self):
+        entry = cache.get(f'turf:{self.turf.pk}')
+        return entry.fresh_until - timezone.now().timestamp()
+
+    def test_short_lived_in_a_per_process_cache(self):
+        listing.approved_turf(self.turf.pk)
+        self.assertLessEqual(self.ttl(), listing.LOCAL_CACHE_TIMEOUT)
+
+    def test_long_lived_in_a_shared_cache(self):
+        with mock.patch('turfs.listing.is_shared', return_value=True):
+            listing.approved_turf(self.turf.pk)
+        self.assertGreater(self.ttl(), listing.LOCAL_CACHE_TIMEOUT)
+
+    def test_status_change_drops_the_cached_turf(self):
+        self.assertEqual(listing.approved_turf(self.turf.pk), self.turf)
+        self.turf.status = 'rejected'
+        self.turf.save()
+        self.assertIsNone(listing.approved_turf(self.turf.pk))
+
+
+class ArchiveTests(TestCase):
+
+    def test_slots_keep_their_base_price_and_label(self):
+        turf = make_turf()
+        slot = Slot.objects.create(
+            turf=turf, date=date.today() - timedelta(days=200), start_time=time(19), end_time=time(20),
+            price=Decimal('960'), base_price=Decimal('800'), label='Prime time',
+        )
+
+        self.assertEqual(archive_before(date.today()), {'bookings': 0, 'slots': 1})
+        archived = ArchivedSlot.objects.get(slot_id=slot.pk)
+        self.assertEqual((archived.price, archived.base_price, archived.label), (Decimal('960'), Decimal('800'), 'Prime time'))
+        self.assertFalse(Slot.objects.exists())
+
+
+class ParseRangeTests(SimpleTestCase):
+
+    def test_ranges(self):
+        self.assertEqual(parse_range('bytes=0-3', 10), (0, 3))
+        self.assertEqual(parse_range('bytes=4-', 10), (4, 9))
+        self.assertEqual(parse_range('bytes=-3', 10), (7, 9))
+        # Past the end is clipped to the file
+        self.assertEqual(parse_range('bytes=8-100', 10), (8, 9))
+        self.assertEqual(parse_range('bytes=-100', 10), (0, 9))
+
+    def test_ignored(self):
+        for header in (None, '', 'bytes=-', 'items=0-3', 'bytes=0-1,4-5'):
+            self.assertIsNone(parse_range(header, 10))
+
+    def test_unsatisfiable(self):
+        for header, size in (('bytes=10-', 10), ('bytes=5-2', 10), ('bytes=-0', 10), ('bytes=-5', 0), ('bytes=0-', 0)):
+            with self.assertRaises(ValueError):
+                parse_range(header, size)
+
+
+class ServeMediaTests(TestCase):
+    body = b'0123456789'
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(MEDIA_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        os.makedirs(os.path.join(root, 'turf_images'))
+        os.makedirs(os.path.join(root, 'verification_docs'))
+        for name, content in (('turf_images/pitch.jpg', self.body), ('turf_images/empty.jpg', b''),
+                              ('verification_docs/id.pdf', b'%PDF-1.4')):
+            with open(os.path.join(root, name), 'wb') as fh:
+                fh.write(content)
+
+    def get(self, name='turf_images/pitch.jpg', **headers):
+        response = self.client.get('/media/' + name, **headers)
+        if response.streaming:
+            response.body = b''.join(response.streaming_content)
+        else:
+            response.body = response.content
+        return response
+
+    def test_whole_file(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.body)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_ranges(self):
+        for header, content_range, body in (
+            ('bytes=2-4', 'bytes 2-4/10', b'234'),
+            ('bytes=7-', 'bytes 7-9/10', b'789'),
+            ('bytes=-2', 'bytes 8-9/10', b'89'),
+        ):
+            response = self.get(HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Range'], content_range)
+            self.assertEqual(response['Content-Length'], str(len(body)))
+            self.assertEqual(response.body, body)
+
+    def test_unsatisfiable_range(self):
+        response = self.get(HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_suffix_range_of_an_empty_file(self):
+        response = self.get('turf_images/empty.jpg', HTTP_RANGE='bytes=-5')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_if_range(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=etag).status_code, 206)
+        # The file changed since: send all of it
+        stale = self.get(HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(stale.status_code, 200)
+        self.assertEqual(stale.body, self.body)
+
+    def test_not_modified(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_hidden_and_escaping_paths(self):
+        self.assertEqual(self.get('.incoming/pitch.jpg').status_code, 404)
+        self.assertEqual(self.get('turf_images/missing.jpg').status_code, 404)
+
+    def test_document_access(self):
+        turf = make_turf()
+        VerificationDocument.objects.create(
+            turf=turf, identity_proof='verification_docs/id.pdf',
+            ownership_agreement='verification_docs/deed.pdf', municipal_permission='verification_docs/noc.pdf',
+        )
+        other_owner = User.objects.create_user(
+            username='other', email='other@example.com', password=None,
+            phone_number='7777777777', role=User.Role.OWNER,
+        )
+        player = User.objects.create_user(
+            username='player', email='player@example.com', password=None, phone_number='8888888888',
+        )
+        admin = User.objects.create_user(
+            username='admin', email='admin@example.com', password=None,
+            phone_number='6666666666', role=User.Role.ADMIN,
+        )
+
+        def status(user):
+            self.client.logout()
+            if user:
+                self.client.force_login(user)
+            return self.get('verification_docs/id.pdf').status_code
+
+        self.assertEqual(status(None), 403)
+        self.assertEqual(status(player), 403)
+        self.assertEqual(status(other_owner), 403)
+        self.assertEqual(status(turf.owner), 200)
+        self.assertEqual(status(admin), 200)
+        self.client.force_login(admin)
+        self.assertEqual(self.get('verification_docs/id.pdf')['Cache-Control'], 'private, max-age=3600')
+
+
+JPEG = b'\xff\xd8\xff\xe0' + b'\0' * 60
+PDF = b'%PDF-1.4\n' + b'\0' * 60
+
+
+class TurfUploadHandlerTests(SimpleTestCase):
+
+    def upload(self, **files):
+        request = RequestFactory().post('/add-turf/', {
+            field: [SimpleUploadedFile(name, content, 'image/jpeg') for name, content in uploads]
+            for field, uploads in files.items()
+        })
+        request.upload_handlers = [TurfUploadHandler(request)]
+        return request, request.FILES
+
+    def test_type_is_sniffed_from_the_content(self):
+        _, files = self.upload(turf_images=[('pitch.png', JPEG)], identity_proof=[('id.jpg', PDF)])
+        self.assertEqual(files['turf_images'].content_type, 'image/jpeg')
+        self.assertEqual(files['identity_proof'].content_type, 'application/pdf')
+
+    def test_rejected_file_is_skipped_and_the_rest_kept(self):
+        request, files = self.upload(turf_images=[('pitch.jpg', JPEG), ('script.jpg', b'#!/bin/sh\n'), ('id.jpg', PDF)])
+        self.assertEqual([f.name for f in files.getlist('turf_images')], ['pitch.jpg'])
+        self.assertEqual(request.upload_errors, [
+            ('turf_images', '"script.jpg" is not a supported file type.'),
+            ('turf_images', '"id.jpg" is not a supported file type.'),
+        ])
+
+    @override_settings(TURF_UPLOAD_MAX_FILE_SIZE=100)
+    def test_file_size_limit(self):
+        request, files = self.upload(turf_images=[('big.jpg', JPEG * 2), ('pitch.jpg', JPEG)])
+        self.assertEqual([f.name for f in files.getlist('turf_images')], ['pitch.jpg'])
+        self.assertEqual(request.upload_errors, [('turf_images', '"big.jpg" is larger than 100\xa0bytes.')])
+
+    @override_settings(TURF_UPLOAD_MAX_TOTAL_SIZE=100)
+    def test_total_size_limit_stops_the_upload(self):
+        request, files = self.upload(turf_images=[('one.jpg', JPEG), ('two.jpg', JPEG), ('three.jpg', JPEG)])
+        self.assertEqual([f.name for f in files.getlist('turf_images')], ['one.jpg'])
+        self.assertEqual(request.upload_errors, [('turf_images', 'Upload too large; the limit is 100\xa0bytes in total.')])
+
+
+class TurfFormCsrfTests(TestCase):
+    """The turf forms swap upload handlers before CSRF is checked, so they
+    check it themselves."""
+
+    def setUp(self):
+        self.turf = make_turf(status='rejected')
+        self.client = Client(enforce_csrf_checks=True)
+        self.client.force_login(self.turf.owner)
+
+    def post(self, url, with_token):
+        data = {'name': 'Arena'}
+        if with_token:
+            self.client.get(url)
+            data['csrfmiddlewaretoken'] = self.client.cookies['csrftoken'].value
+        return self.client.post(url, data)
+
+    def test_add_turf(self):
+        url = reverse('add_turf')
+        self.assertEqual(self.post(url, with_token=False).status_code, 403)
+        self.assertEqual(self.post(url, with_token=True).status_code, 200)
+
+    def test_edit_turf(self):
+        url = reverse('edit_turf', args=[self.turf.pk])
+        self.assertEqual(self.post(url, with_token=False).status_code, 403)
+        self.assertEqual(self.post(url, with_token=True).status_code, 200)
+
+
+class BookingTokenTests(TestCase):
+
+    def setUp(self):
+        turf = make_turf()
+        self.player = User.objects.create_user(
+            username='player', email='player@example.com', password=None, phone_number='8888888888',
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password=None, phone_number='7777777777',
+        )
+        self.slot = Slot.objects.create(
+            turf=turf, date=date.today() + timedelta(days=1), start_time=time(6), end_time=time(7),
+            price=Decimal('800'), status='held',
+        )
+        self.booking = Booking.objects.create(
+            player=self.player, turf=turf, date=self.slot.date, total_amount=Decimal('800'),
+            status='pending', expires_at=timezone.now() + timedelta(minutes=10),
+        )
+        self.booking.slots.add(self.slot)
+        self.token = make_booking_token(self.booking)
+
+    def test_valid(self):
+        self.assertEqual(read_booking_token(self.token, self.player), self.booking.pk)
+
+    def test_forged(self):
+        value, signature = self.token.rsplit(':', 1)
+        booking_id, player_id, expires = value.split('.')
+        forged = f'{int(booking_id) + 1}.{player_id}.{expires}:{signature}'
+        self.assertIsNone(read_booking_token(forged, self.player))
+        self.assertIsNone(read_booking_token('garbage', self.player))
+        self.assertIsNone(read_booking_token('', self.player))
+
+    def test_other_player(self):
+        self.assertIsNone(read_booking_token(self.token, self.other))
+
+    def test_expired(self):
+        self.booking.expires_at = timezone.now() - timedelta(seconds=1)
+        self.assertIsNone(read_booking_token(make_booking_token(self.booking), self.player))
+
+    def cancel(self, user, token):
+        self.client.force_login(user)
+        response = self.client.post(reverse('cancel_booking'), {'token': token})
+        self.booking.refresh_from_db()
+        self.slot.refresh_from_db()
+        return response
+
+    def test_cancel(self):
+        self.assertRedirects(self.cancel(self.player, self.token), reverse('browse_turfs'), fetch_redirect_response=False)
+        self.assertEqual((self.booking.status, self.slot.status), ('cancelled', 'available'))
+
+    def test_cancel_with_a_token_that_does_not_fit(self):
+        self.booking.expires_at = timezone.now() - timedelta(seconds=1)
+        expired = make_booking_token(self.booking)
+        for user, token in ((self.other, self.token), (self.player, expired), (self.player, self.token + 'x')):
+            self.cancel(user, token)
+            self.assertEqual((self.booking.status, self.slot.status), ('pending', 'held'))
+
+    def test_cancel_needs_a_post(self):
+        self.client.force_login(self.player)
+        response = self.client.get(reverse('cancel_booking'), {'token': self.token})
+        self.assertEqual(response.status_code, 405)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, 'pending')
+
+    def test_summary_cancels_with_a_form(self):
+        self.client.force_login(self.player)
+        response = self.client.get(reverse('booking_summary'), {'token': self.token})
+        self.assertContains(response, f'<form action="{reverse("cancel_booking")}" method="POST"', html=False)
+        self.assertNotContains(response, f'{reverse("cancel_booking")}?token=')
+
+
+class DailyTurfStatsTests(TestCase):
+    """The rollup follows bookings as they are paid, cancelled and expire,
+    and a rebuild from the raw rows gives the same numbers."""
+
+    def setUp(self):
+        cache.clear()
+        self.turf = make_turf(status='approved')
+        self.player = User.objects.create_user(
+            username='player', email='player@example.com', password=None, phone_number='8888888888',
+        )
+        self.day = date.today() + timedelta(days=1)
+        self.slots = [
+            Slot.objects.create(
+                turf=self.turf, date=self.day, start_time=time(hour), end_time=time(hour + 1), price=Decimal('800'),
+            )
+            for hour in (6, 7, 8)
+        ]
+        refresh_slot_counts(self.turf.pk, self.day)
+        self.client.force_login(self.player)
+
+    def stats(self):
+        return DailyTurfStats.objects.values(
+            'bookings', 'paid_revenue', 'cancelled', 'slots_offered', 'slots_booked', 'occupancy',
+        ).get(turf=self.turf, date=self.day)
+
+    def hold(self, slot):
+        response = self.client.post(reverse('hold_slot'), {'slot_id': str(slot.pk)})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['booking_token']
+
+    def test_bookings_update_the_rollup(self):
+        self.assertEqual(self.stats(), {
+            'bookings': 0, 'paid_revenue': Decimal('0'), 'cancelled': 0,
+            'slots_offered': 3, 'slots_booked': 0, 'occupancy': Decimal('0'),
+        })
+
+        with mock.patch('turfs.views.random.random', return_value=0.0):
+            self.client.post(reverse('payment_process'), {'token': self.hold(self.slots[0])})
+        self.client.post(reverse('cancel_booking'), {'token': self.hold(self.slots[1])})
+        self.hold(self.slots[2])
+        Booking.objects.filter(status='pending').update(expires_at=timezone.now() - timedelta(minutes=1))
+        expire_pending_bookings()
+
+        live = self.stats()
+        self.assertEqual(live, {
+            'bookings': 1, 'paid_revenue': Decimal('800'), 'cancelled': 2,
+            'slots_offered': 3, 'slots_booked': 1, 'occupancy': Decimal('33.33'),
+        })
+
+        DailyTurfStats.objects.all().delete()
+        call_command('backfill_turf_stats', stdout=io.StringIO())
+        self.assertEqual(self.stats(), live)
+
+    def test_rebuild_keeps_archived_history(self):
+        with mock.patch('turfs.views.random.random', return_value=0.0):
+            self.client.post(reverse('payment_process'), {'token': self.hold(self.slots[0])})
+        live = self.stats()
+        Booking.objects.update(date=date.today() - timedelta(days=200))
+        Slot.objects.update(date=date.today() - timedelta(days=200))
+        DailyTurfStats.objects.update(date=date.today() - timedelta(days=200))
+        archive_before(date.today())
+
+        DailyTurfStats.objects.all().delete()
+        call_command('backfill_turf_stats', stdout=io.StringIO())
+        self.day = date.today() - timedelta(days=200)
+        self.assertEqual(self.stats(), live)
+
+
+def jpeg_bytes(size=(600, 400)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'green').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+class TurfImageVariantTests(TestCase):
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        settings_override = override_settings(MEDIA_ROOT=root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.turf_image = TurfImage(turf=make_turf())
+        self.turf_image.image.save('pitch.jpg', ContentFile(jpeg_bytes()))
+
+    def test_variants_are_scaled_down_never_up(self):
+        sizes = {(kind, fmt): (width, height) for kind, fmt, width, height, _ in render_variants(jpeg_bytes())}
+        self.assertEqual(sizes, {
+            ('card', 'webp'): (480, 320), ('card', 'jpeg'): (480, 320),
+            ('detail', 'webp'): (600, 400), ('detail', 'jpeg'): (600, 400),
+            ('hero', 'webp'): (600, 400), ('hero', 'jpeg'): (600, 400),
+            ('thumbnail', 'jpeg'): (320, 240),
+        })
+
+    def test_generate_stores_variants_and_thumbnail(self):
+        generate_variants(self.turf_image)
+        self.turf_image.refresh_from_db()
+        self.assertEqual(self.turf_image.variants.count(), 6)
+        self.assertNotEqual(self.turf_image.thumbnail_url, self.turf_image.image.url)
+        with Image.open(self.turf_image.thumbnail.path) as thumb:
+            self.assertEqual(thumb.size, (320, 240))
+        self.assertEqual([entry.split()[1] for entry in self.turf_image.srcset().split(', ')], ['480w', '600w', '600w'])
+
+        generate_variants(self.turf_image)
+        self.assertEqual(self.turf_image.variants.count(), 6)
+
+    def test_thumbnail_url_falls_back_to_the_original(self):
+        self.assertFalse(self.turf_image.thumbnail)
+        self.assertEqual(self.turf_image.thumbnail_url, self.turf_image.image.url)
+
+    @override_settings(IMAGE_VARIANTS_ASYNC=False)
+    def test_scheduled_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_variants([self.turf_image.id])
+            self.assertFalse(TurfImageVariant.objects.exists())
+        self.assertEqual(TurfImageVariant.objects.filter(image=self.turf_image).count(), 6)
+
+    @override_settings(IMAGE_VARIANTS_ASYNC=False)
+    def test_unreadable_upload_keeps_the_original(self):
+        broken = TurfImage(turf=self.turf_image.turf)
+        broken.image.save('broken.jpg', ContentFile(b'not an image'))
+        with self.assertLogs('turfs.images', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+            schedule_variants([broken.id])
+        broken.refresh_from_db()
+        self.assertFalse(broken.variants.exists())
+        self.assertEqual(broken.thumbnail_url, broken.image.url)
+
+
+class BenchmarkSessionsTests(TestCase):
+
+    def test_compares_each_backend_and_rolls_back(self):
+        stdout = io.StringIO()
+        call_command('benchmark_sessions', 'db', 'signed_cookies', iterations=2, stdout=stdout)
+        lines = stdout.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[:2]], ['db', 'signed_cookies'])
+        self.assertNotIn(' 0.0 session-table', lines[0])
+        self.assertIn(' 0.0 session-table', lines[1])
+        db_cookie, signed_cookie = (int(line.split('cookie ')[1].split()[0]) for line in lines[:2])
+        self.assertGreater(signed_cookie, db_cookie)
+        self.assertEqual(lines[2], 'Compared 2 backends.')
+        self.assertFalse(Turf.objects.exists())
+        self.assertFalse(User.objects.exists())
+
+    def test_unknown_backend(self):
+        with self.assertRaisesMessage(CommandError, 'Unknown session backends: cache'):
+            call_command('benchmark_sessions', 'cache', stdout=io.StringIO())
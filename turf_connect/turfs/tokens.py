@@ -0,0 +1,32 @@
+"""Signed booking tokens for the hold -> summary -> payment flow.
+
+``hold_slot`` hands the browser a token naming the booking, the player and
+the hold's expiry, signed with ``SECRET_KEY``. The later steps carry it in
+the URL or form, so they need no session state and one browser can run
+several bookings side by side in different tabs.
+"""
+from django.core import signing
+from django.utils import timezone
+
+SALT = 'turfs.booking-token'
+
+
+def make_booking_token(booking):
+    expires = int(booking.expires_at.timestamp())
+    value = f'{booking.id}.{booking.player_id}.{expires}'
+    return signing.Signer(salt=SALT).sign(value)
+
+
+def read_booking_token(token, player):
+    """Return the booking id in ``token``, or ``None`` if the token is forged,
+    belongs to another player or has expired."""
+    if not token:
+        return None
+    try:
+        value = signing.Signer(salt=SALT).unsign(token)
+        booking_id, player_id, expires = (int(part) for part in value.split('.'))
+    except (signing.BadSignature, ValueError):
+        return None
+    if player_id != player.id or expires < timezone.now().timestamp():
+        return None
+    return booking_id
@@ -0,0 +1,99 @@
+"""Upload handler for turf submissions.
+
+Files are streamed to temporary files chunk by chunk, and each upload is
+checked as the data arrives: the content type is sniffed from the first
+bytes, and per-file and per-request size limits are enforced. Uploads that
+fail a check are dropped (or the whole request is cut off) without buffering
+the rest of the body.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import SkipFile, StopUpload, TemporaryFileUploadHandler
+from django.template.defaultfilters import filesizeformat
+
+MB = 1024 * 1024
+
+IMAGE_TYPES = {'image/jpeg', 'image/png', 'image/webp'}
+DOCUMENT_TYPES = IMAGE_TYPES | {'application/pdf'}
+
+# Form field -> content types accepted for it
+FIELD_CONTENT_TYPES = {
+    'turf_images': IMAGE_TYPES,
+    'identity_proof': DOCUMENT_TYPES,
+    'ownership_agreement': DOCUMENT_TYPES,
+    'municipal_permission': DOCUMENT_TYPES,
+    'gst_certificate': DOCUMENT_TYPES,
+}
+
+
+def sniff_content_type(head):
+    """Identify a file from its leading bytes, or return ``None``."""
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head.startswith(b'%PDF-'):
+        return 'application/pdf'
+    return None
+
+
+class TurfUploadHandler(TemporaryFileUploadHandler):
+    """Stream turf uploads to disk and reject bad files while they arrive.
+
+    Problems are collected on ``request.upload_errors`` as
+    ``(field_name, message)`` pairs for the form to report.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_file_size = getattr(settings, 'TURF_UPLOAD_MAX_FILE_SIZE', 10 * MB)
+        self.max_total_size = getattr(settings, 'TURF_UPLOAD_MAX_TOTAL_SIZE', 40 * MB)
+        self.total_size = 0
+        self.request_too_large = False
+        if request is not None:
+            request.upload_errors = []
+
+    def _reject(self, message):
+        if self.request is not None:
+            self.request.upload_errors.append((self.field_name, message))
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # The parser only honours StopUpload once it is reading parts, so an
+        # oversized Content-Length is remembered here and acted on in new_file().
+        self.request_too_large = bool(content_length and content_length > self.max_total_size + MB)
+        return super().handle_raw_input(input_data, META, content_length, boundary, encoding)
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        if self.request_too_large:
+            self.field_name = None
+            self._reject(f"Upload too large; the limit is {filesizeformat(self.max_total_size)} in total.")
+            raise StopUpload(connection_reset=True)
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0:
+            allowed = FIELD_CONTENT_TYPES.get(self.field_name)
+            sniffed = sniff_content_type(raw_data[:16])
+            if allowed is not None and sniffed not in allowed:
+                self._reject(f'"{self.file_name}" is not a supported file type.')
+                raise SkipFile()
+            if sniffed:
+                self.content_type = sniffed
+
+        if start + len(raw_data) > self.max_file_size:
+            self._reject(f'"{self.file_name}" is larger than {filesizeformat(self.max_file_size)}.')
+            raise SkipFile()
+
+        self.total_size += len(raw_data)
+        if self.total_size > self.max_total_size:
+            self._reject(f"Upload too large; the limit is {filesizeformat(self.max_total_size)} in total.")
+            raise StopUpload(connection_reset=True)
+
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.content_type = self.content_type
+        return uploaded
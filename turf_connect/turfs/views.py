@@ -3,26 +3,52 @@ import json
 import uuid
 import random
 from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib import messages
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
+from django.http import Http404, HttpResponseForbidden, JsonResponse
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_POST
 from datetime import datetime, time, timedelta
 
-from django.db import transaction
 from django.db.models import Count, Q
 from django.utils import timezone
 from .forms import AddTurfForm
 from .models import Turf, TurfImage, VerificationDocument, Slot, Booking, Payment
+from .images import schedule_variants
+from .listing import BROWSE_PAGE_PREFIX, PAGE_CACHE_TIMEOUT, approved_turf, browse_listing
+from .media import can_view, clean_name, media_response
+from .pricing import reprice_turf
+from .signals import release_files
+from .stats import record_cancellation, record_payment, refresh_slot_counts
+from .tokens import make_booking_token, read_booking_token
+from .uploadhandlers import TurfUploadHandler
+from bmt.caching import cached_view
 from bmt.decorators import player_required, owner_required
+from bmt.metrics import (
+    BOOKINGS_EXPIRED, CANCELLATIONS, HOLDS_ATTEMPTED, HOLDS_CONFLICTED, HOLDS_SUCCEEDED, PAYMENTS,
+)
+from bmt.ratelimit import rate_limit
+from bmt.routers import replica_reads
+from bmt.sharding import assign_ids, atomic as shard_atomic, locate, set_shard, shard_for_city
 
 
 @owner_required
+@csrf_exempt
 def add_turf(request):
     """Allow turf owners to submit a new turf listing."""
+    # Upload handlers must be swapped before anything reads the body, so
+    # CSRF is checked in the inner view instead of by the middleware.
+    request.upload_handlers = [TurfUploadHandler(request)]
+    return _add_turf(request)
+
 
+@csrf_protect
+def _add_turf(request):
     if request.method == 'POST':
-        form = AddTurfForm(request.POST, request.FILES)
+        form = AddTurfForm(request.POST, request.FILES, upload_errors=request.upload_errors)
         if form.is_valid():
+            set_shard(shard_for_city(form.cleaned_data['city']))
+
             # 1. Save Turf (owner + status set here, not from form)
             turf = form.save(commit=False)
             turf.owner = request.user
@@ -30,8 +56,11 @@ def add_turf(request):
             turf.save()
 
             # 2. Save uploaded turf images
-            for img in request.FILES.getlist('turf_images'):
-                TurfImage.objects.create(turf=turf, image=img)
+            image_ids = [
+                TurfImage.objects.create(turf=turf, image=img).id
+                for img in request.FILES.getlist('turf_images')
+            ]
+            schedule_variants(image_ids)
 
             # 3. Save verification documents
             VerificationDocument.objects.create(
@@ -53,17 +82,22 @@ def add_turf(request):
 
 
 @owner_required
+@csrf_exempt
 def edit_turf(request, turf_id):
     """Allow turf owners to edit and resubmit a rejected turf."""
+    request.upload_handlers = [TurfUploadHandler(request)]
+    return _edit_turf(request, turf_id)
 
 
+@csrf_protect
+def _edit_turf(request, turf_id):
     turf = get_object_or_404(Turf, id=turf_id, owner=request.user)
 
     if turf.status != 'rejected':
         return HttpResponseForbidden("Only rejected turfs can be edited.")
 
     if request.method == 'POST':
-        form = AddTurfForm(request.POST, request.FILES, instance=turf)
+        form = AddTurfForm(request.POST, request.FILES, instance=turf, upload_errors=request.upload_errors)
         if form.is_valid():
             turf = form.save(commit=False)
             turf.status = 'pending'
@@ -74,12 +108,19 @@ def edit_turf(request, turf_id):
             new_images = request.FILES.getlist('turf_images')
             if new_images:
                 TurfImage.objects.filter(turf=turf).delete()
-                for img in new_images:
-                    TurfImage.objects.create(turf=turf, image=img)
+                schedule_variants(
+                    TurfImage.objects.create(turf=turf, image=img).id
+                    for img in new_images
+                )
 
             # Replace verification documents if new ones uploaded
             doc = VerificationDocument.objects.filter(turf=turf).first()
             if doc:
+                replaced = [
+                    getattr(doc, field) for field in
+                    ('identity_proof', 'ownership_agreement', 'municipal_permission', 'gst_certificate')
+                    if field in request.FILES
+                ]
                 if 'identity_proof' in request.FILES:
                     doc.identity_proof = form.cleaned_data['identity_proof']
                 if 'ownership_agreement' in request.FILES:
@@ -89,6 +130,7 @@ def edit_turf(request, turf_id):
                 if 'gst_certificate' in request.FILES:
                     doc.gst_certificate = form.cleaned_data['gst_certificate']
                 doc.save()
+                release_files(*replaced, using=doc._state.db)
 
             messages.success(request, 'Turf resubmitted for verification!')
             return redirect('owner_dashboard')
@@ -104,27 +146,12 @@ def edit_turf(request, turf_id):
     })
 
 
-
+# Logged-in visitors get a logout form with a CSRF token, so per user
+@cached_view(BROWSE_PAGE_PREFIX, PAGE_CACHE_TIMEOUT, vary='user')
+@replica_reads
 def browse_turfs(request):
-    turfs = Turf.objects.filter(status="approved")
-
-    data = []
-    for turf in turfs:
-        data.append({
-            "id": turf.id,
-            "name": turf.name,
-            "city": turf.city,
-            "state": turf.state,
-            "description": turf.description[:120],
-            "locationKey": turf.city.lower(),
-            "price": 1000,
-            "rating": 5.0,
-            "facilities": turf.facilities,
-            "verified": True
-        })
-
     return render(request, "browse.html", {
-        "turf_json": data
+        "turf_json": browse_listing()
     })
 
 
@@ -136,27 +163,41 @@ def expire_pending_bookings():
     if not expired_bookings.exists():
         return
 
-    with transaction.atomic():
-        for booking in expired_bookings:
+    expired = 0
+    with shard_atomic():
+        for booking in expired_bookings.select_for_update().filter(status="pending"):
             # Release all slots associated with this booking
             booking.slots.update(status="available", hold_expiry=None)
             
             # Cancel the booking
             booking.status = "cancelled"
             booking.save()
+            record_cancellation(booking)
+            expired += 1
+    BOOKINGS_EXPIRED.inc(expired)
+
 
+def release_stale_holds():
+    """Free slots whose hold ran out without a booking to expire."""
+    stale = Slot.objects.filter(status="held", hold_expiry__lt=timezone.now())
+    if stale.exists():
+        stale.update(status="available", hold_expiry=None)
 
+
+@replica_reads
 def turf_detail(request, turf_id):
     """Display detailed information for a specific turf."""
     expire_pending_bookings()
     
-    turf = get_object_or_404(Turf, id=turf_id, status='approved')
-    
+    turf = approved_turf(turf_id)
+    if turf is None:
+        raise Http404("No Turf matches the given query.")
+
     # Filter future slots for the player view
     now = timezone.localtime()
     
     # Auto-cleanup expired holds
-    Slot.objects.filter(status="held", hold_expiry__lt=now).update(status="available", hold_expiry=None)
+    release_stale_holds()
     
     today = now.date()
     now_time = now.time()
@@ -191,10 +232,10 @@ def turf_detail(request, turf_id):
     })
 
 @owner_required
-def slot_management(request, id):
+def slot_management(request, turf_id):
     """Display the slot management page for a specific turf."""
     
-    turf = get_object_or_404(Turf, id=id, owner=request.user)
+    turf = get_object_or_404(Turf, id=turf_id, owner=request.user)
     
     # Current date and time for filtering past slots
     now = timezone.localtime()
@@ -280,6 +321,7 @@ def slot_management(request, id):
                         slot_to_update.start_time = datetime.strptime(new_start, '%H:%M').time()
                         slot_to_update.end_time = datetime.strptime(new_end, '%H:%M').time()
                         slot_to_update.price = new_price
+                        slot_to_update.base_price = new_price
                         slot_to_update.label = new_label
                         
                         if slot_to_update.start_time >= slot_to_update.end_time:
@@ -292,6 +334,19 @@ def slot_management(request, id):
                         messages.error(request, f"Error updating slot: {str(e)}")
             return redirect(f"{request.path}?date={selected_date}")
 
+        if action in ('reprice_preview', 'reprice'):
+            summary = reprice_turf(turf, dry_run=(action == 'reprice_preview'))
+            if action == 'reprice_preview':
+                messages.info(
+                    request,
+                    f"Dynamic pricing would change {summary['changed']} of {summary['slots']} open slots "
+                    f"(listed revenue ₹{summary['current_revenue']} → ₹{summary['projected_revenue']}, "
+                    f"delta ₹{summary['revenue_delta']})."
+                )
+            else:
+                messages.success(request, f"Repriced {summary['changed']} slots.")
+            return redirect(f"{request.path}?date={selected_date}&tab=bulk")
+
         # Regular Add Slot Logic
         start_time_str = request.POST.get('start_time')
         price = request.POST.get('price')
@@ -312,8 +367,10 @@ def slot_management(request, id):
                         date=selected_date,
                         start_time=start_time_obj,
                         end_time=end_time_obj,
-                        price=price
+                        price=price,
+                        base_price=price
                     )
+                    refresh_slot_counts(turf.id, selected_date)
                     messages.success(request, f"Slot created for {start_time_obj.strftime('%g %A')}.")
                     return redirect(f"{request.path}?date={selected_date}&tab=add")
             except Exception as e:
@@ -445,7 +502,7 @@ def slot_management(request, id):
             # Database Execution (Atomic Transaction)
             slots_created_count = 0
             try:
-                with transaction.atomic():
+                with shard_atomic():
                     new_slot_objects = []
                     for slot_data in generated_slots:
                         existing = Slot.objects.filter(turf=turf, date=slot_data['date'], start_time=slot_data['start_time']).first()
@@ -453,12 +510,15 @@ def slot_management(request, id):
                             if conflict_strategy == 'overwrite' and not existing.is_booked:
                                 existing.delete()
                                 slots_created_count += 1
-                                new_slot_objects.append(Slot(turf=turf, date=slot_data['date'], start_time=slot_data['start_time'], end_time=slot_data['end_time'], price=slot_data['price']))
+                                new_slot_objects.append(Slot(turf=turf, date=slot_data['date'], start_time=slot_data['start_time'], end_time=slot_data['end_time'], price=slot_data['price'], base_price=slot_data['price']))
                         else:
                             slots_created_count += 1
-                            new_slot_objects.append(Slot(turf=turf, date=slot_data['date'], start_time=slot_data['start_time'], end_time=slot_data['end_time'], price=slot_data['price']))
+                            new_slot_objects.append(Slot(turf=turf, date=slot_data['date'], start_time=slot_data['start_time'], end_time=slot_data['end_time'], price=slot_data['price'], base_price=slot_data['price']))
                     if new_slot_objects:
+                        assign_ids(new_slot_objects)
                         Slot.objects.bulk_create(new_slot_objects)
+                        for d in {slot.date for slot in new_slot_objects}:
+                            refresh_slot_counts(turf.id, d)
                 
                 messages.success(request, f"Successfully created {slots_created_count} slots.")
                 request.session.pop('bulk_params', None)
@@ -513,96 +573,120 @@ def delete_slot(request, slot_id):
         messages.error(request, "Cannot delete a booked slot.")
     else:
         slot.delete()
+        refresh_slot_counts(turf_id, slot.date)
         messages.success(request, "Slot deleted successfully.")
         
     return redirect(f"{reverse('slot_management', args=[turf_id])}?date={date_str}")
 
 @player_required
 @csrf_exempt
+@rate_limit('hold_slot', user='10/m', ip='30/m', turf='120/m')
 def hold_slot(request):
     """Temporarily hold multiple slots for 5 minutes atomically and create a pending booking."""
     if request.method == 'POST':
+        HOLDS_ATTEMPTED.inc()
         slot_ids_str = request.POST.get('slot_id')  # Keeping parameter name same for compatibility
         if not slot_ids_str:
             return JsonResponse({'status': 'error', 'message': 'Missing slot_id'}, status=400)
+        set_shard(locate(Slot, slot_ids_str.split(',')[0].strip()))
             
         # Global cleanup of expired holds before processing
         expire_pending_bookings()
-        Slot.objects.filter(status="held", hold_expiry__lt=timezone.now()).update(status="available", hold_expiry=None)
+        release_stale_holds()
         
         slot_ids = [s.strip() for s in slot_ids_str.split(',') if s.strip()]
+        player = request.user
         
-        try:
-            with transaction.atomic():
-                # Lock the rows to prevent race conditions
-                slots = list(Slot.objects.select_for_update().filter(id__in=slot_ids))
-                
-                # Verify we found all requested slots
-                if len(slots) != len(slot_ids):
-                    return JsonResponse({'status': 'error', 'message': 'One or more slots not found'}, status=404)
-                
-                # Validation: Maximum 3 slots
-                if len(slots) > 3:
-                    return JsonResponse({'status': 'error', 'message': 'Maximum 3 slots allowed.'}, status=400)
-                
-                # Validation: Same date and same turf
-                first_date = slots[0].date
-                first_turf = slots[0].turf
-                for slot in slots:
-                    if slot.date != first_date or slot.turf != first_turf:
-                        return JsonResponse({'status': 'error', 'message': 'All selected slots must be on same date.'}, status=400)
-                
-                # Check availability for all slots
-                for slot in slots:
-                    if slot.status != 'available':
-                        return JsonResponse({'status': 'error', 'message': 'One or more slots no longer available'}, status=400)
-                
-                # Calculate total amount
-                total_amount = sum(slot.price for slot in slots)
-                
-                # Proceed to hold slots
-                expiry_time = timezone.now() + timedelta(minutes=5)
-                
-                # Create Booking object
-                booking = Booking.objects.create(
-                    player=request.user,
-                    turf=first_turf,
-                    date=first_date,
-                    total_amount=total_amount,
-                    status="pending",
-                    expires_at=expiry_time
-                )
-                
-                # Add slots to booking
-                booking.slots.set(slots)
-                
-                # Store booking_id in session
-                request.session["booking_id"] = booking.id
+        def hold():
+            # Lock the rows to prevent race conditions
+            slots = list(Slot.objects.select_for_update().filter(id__in=slot_ids))
+            
+            # Verify we found all requested slots
+            if len(slots) != len(slot_ids):
+                return JsonResponse({'status': 'error', 'message': 'One or more slots not found'}, status=404)
+            
+            # Validation: Maximum 3 slots
+            if len(slots) > 3:
+                return JsonResponse({'status': 'error', 'message': 'Maximum 3 slots allowed.'}, status=400)
+            
+            # Validation: Same date and same turf
+            first_date = slots[0].date
+            first_turf = slots[0].turf
+            for slot in slots:
+                if slot.date != first_date or slot.turf != first_turf:
+                    return JsonResponse({'status': 'error', 'message': 'All selected slots must be on same date.'}, status=400)
+            
+            # Check availability for all slots
+            for slot in slots:
+                if slot.status != 'available':
+                    HOLDS_CONFLICTED.inc()
+                    return JsonResponse({'status': 'error', 'message': 'One or more slots no longer available'}, status=400)
+            
+            # Calculate total amount
+            total_amount = sum(slot.price for slot in slots)
+            
+            # Proceed to hold slots
+            expiry_time = timezone.now() + timedelta(minutes=5)
+            
+            # Create Booking object
+            booking = Booking.objects.create(
+                player=player,
+                turf=first_turf,
+                date=first_date,
+                total_amount=total_amount,
+                status="pending",
+                expires_at=expiry_time
+            )
+            
+            # Add slots to booking
+            booking.slots.set(slots)
+            
+            for slot in slots:
+                slot.status = 'held'
+                slot.hold_expiry = expiry_time
+                slot.save()
                 
-                for slot in slots:
-                    slot.status = 'held'
-                    slot.hold_expiry = expiry_time
-                    slot.save()
-                    
-                return JsonResponse({
-                    'status': 'success', 
-                    'message': f'{len(slot_ids)} slots held and booking {booking.id} created successfully',
-                    'booking_id': booking.id,
-                    'hold_expiry': expiry_time.isoformat()
-                })
+            return JsonResponse({
+                'status': 'success', 
+                'message': f'{len(slot_ids)} slots held and booking {booking.id} created successfully',
+                'booking_id': booking.id,
+                'booking_token': make_booking_token(booking),
+                'hold_expiry': expiry_time.isoformat()
+            })
+
+        try:
+            with shard_atomic():
+                response = hold()
         except Exception as e:
             return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+        if response.status_code == 200:
+            HOLDS_SUCCEEDED.inc()
+        return response
             
     return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=405)
 
+def _token_booking_id(request):
+    """Booking id from the signed token in the query string or form."""
+    token = request.POST.get('token') or request.GET.get('token')
+    booking_id = read_booking_token(token, request.user)
+    if booking_id:
+        set_shard(locate(Booking, booking_id))
+    return booking_id, token
+
+
+def _payment_page_url(token):
+    return f"{reverse('payment_page')}?{urlencode({'token': token})}"
+
+
 @player_required
 def booking_summary(request):
     """Display the summary of a pending booking."""
     expire_pending_bookings()
     
-    booking_id = request.session.get('booking_id')
+    booking_id, token = _token_booking_id(request)
     
     if not booking_id:
+        messages.error(request, "This booking has expired.")
         return redirect('browse_turfs')
         
     booking = get_object_or_404(Booking, id=booking_id, player=request.user)
@@ -611,7 +695,7 @@ def booking_summary(request):
         messages.error(request, "This booking has expired.")
         return redirect('browse_turfs')
     
-    return render(request, 'booking_summary.html', {'booking': booking})
+    return render(request, 'booking_summary.html', {'booking': booking, 'booking_token': token})
 
 
 @player_required
@@ -619,9 +703,10 @@ def payment_page(request):
     """Display the payment page for a pending booking."""
     expire_pending_bookings()
     
-    booking_id = request.session.get('booking_id')
+    booking_id, token = _token_booking_id(request)
     
     if not booking_id:
+        messages.error(request, "This booking is no longer active.")
         return redirect('browse_turfs')
         
     booking = get_object_or_404(Booking, id=booking_id, player=request.user)
@@ -630,7 +715,7 @@ def payment_page(request):
         messages.error(request, "This booking is no longer active.")
         return redirect('browse_turfs')
         
-    return render(request, 'payment.html', {'booking': booking})
+    return render(request, 'payment.html', {'booking': booking, 'booking_token': token})
 
 
 @player_required
@@ -639,9 +724,9 @@ def payment_process(request):
     if request.method != "POST":
         return redirect('browse_turfs')
 
-    booking_id = request.session.get('booking_id')
+    booking_id, token = _token_booking_id(request)
     if not booking_id:
-        messages.error(request, "Session expired. Please try again.")
+        messages.error(request, "Booking expired. Please try again.")
         return redirect('browse_turfs')
 
     booking = get_object_or_404(Booking, id=booking_id, player=request.user)
@@ -650,53 +735,68 @@ def payment_process(request):
         messages.error(request, "This booking is no longer awaiting payment.")
         return redirect('browse_turfs')
 
-    try:
-        with transaction.atomic():
-            # Check for expiration right before processing
-            if booking.expires_at and timezone.now() > booking.expires_at:
-                messages.error(request, "Booking expired.")
-                return redirect('booking_summary')
-
-            # Simulate payment success (70% success rate)
-            is_success = random.random() < 0.7
+    def settle():
+        # Another request may have paid or cancelled it since the check above
+        booking = Booking.objects.select_for_update().filter(pk=booking_id, status="pending").first()
+        if booking is None:
+            return "settled"
+
+        # Check for expiration right before processing
+        if booking.expires_at and timezone.now() > booking.expires_at:
+            return "expired"
+
+        # Simulate payment success (70% success rate)
+        is_success = random.random() < 0.7
+        
+        payment_id = f"PAY-{uuid.uuid4().hex[:12].upper()}"
+        
+        if is_success:
+            # Create Payment record
+            Payment.objects.create(
+                booking=booking,
+                payment_id=payment_id,
+                amount=booking.total_amount,
+                status="success"
+            )
             
-            payment_id = f"PAY-{uuid.uuid4().hex[:12].upper()}"
+            # Update Booking status
+            booking.status = "paid"
+            booking.save()
             
-            if is_success:
-                # Create Payment record
-                Payment.objects.create(
-                    booking=booking,
-                    payment_id=payment_id,
-                    amount=booking.total_amount,
-                    status="success"
-                )
-                
-                # Update Booking status
-                booking.status = "paid"
-                booking.save()
-                
-                # Update Slots status
-                booking.slots.select_for_update().update(status="booked", hold_expiry=None)
-                
-                # Clear session booking_id on success
-                request.session.pop('booking_id', None)
-                
-                messages.success(request, f"Payment Successful! Your booking (ID: {booking.id}) is confirmed.")
-                return redirect('booking_success', booking_id=booking.id)
-            else:
-                # Simulated failure logic
-                Payment.objects.create(
-                    booking=booking,
-                    payment_id=payment_id,
-                    amount=booking.total_amount,
-                    status="failed"
-                )
-                messages.error(request, "Payment failed. Try again.")
-                return redirect('payment_page')
-                
+            # Update Slots status
+            booking.slots.select_for_update().update(status="booked", hold_expiry=None)
+            record_payment(booking)
+            return "paid"
+
+        # Simulated failure logic
+        Payment.objects.create(
+            booking=booking,
+            payment_id=payment_id,
+            amount=booking.total_amount,
+            status="failed"
+        )
+        return "failed"
+
+    try:
+        with shard_atomic():
+            outcome = settle()
     except Exception as e:
+        PAYMENTS.inc(result='error')
         messages.error(request, f"An error occurred: {str(e)}")
-        return redirect('payment_page')
+        return redirect(_payment_page_url(token))
+
+    if outcome == "settled":
+        messages.error(request, "This booking is no longer awaiting payment.")
+        return redirect('browse_turfs')
+    PAYMENTS.inc(result={'paid': 'success', 'failed': 'failure'}.get(outcome, outcome))
+    if outcome == "expired":
+        messages.error(request, "Booking expired.")
+        return redirect('browse_turfs')
+    if outcome == "paid":
+        messages.success(request, f"Payment Successful! Your booking (ID: {booking.id}) is confirmed.")
+        return redirect('booking_success', booking_id=booking.id)
+    messages.error(request, "Payment failed. Try again.")
+    return redirect(_payment_page_url(token))
 
 
 @player_required
@@ -715,26 +815,43 @@ def booking_success(request, booking_id):
         'payment': payment
     })
 @player_required
+@require_POST
 def cancel_booking(request):
     """Allow user to cancel their pending booking and release slots."""
-    booking_id = request.session.get('booking_id')
+    booking_id, _ = _token_booking_id(request)
     if not booking_id:
         return redirect('browse_turfs')
 
     booking = get_object_or_404(Booking, id=booking_id, player=request.user)
     
     if booking.status == "pending":
-        with transaction.atomic():
+        def cancel():
+            # A payment may have settled it since the check above
+            booking = Booking.objects.select_for_update().filter(pk=booking_id, status="pending").first()
+            if booking is None:
+                return False
+
             # Release all slots
             booking.slots.select_for_update().update(status="available", hold_expiry=None)
             
             # Mark booking as cancelled
             booking.status = "cancelled"
             booking.save()
-            
-            # Clear session
-            request.session.pop('booking_id', None)
-            
+            record_cancellation(booking)
+            return True
+
+        with shard_atomic():
+            cancelled = cancel()
+        if cancelled:
+            CANCELLATIONS.inc()
             messages.success(request, "Booking cancelled successfully.")
     
     return redirect('browse_turfs')
+
+
+def serve_media(request, path):
+    """Serve an uploaded file; verification documents need permission."""
+    name = clean_name(path)
+    if not can_view(request.user, name):
+        return HttpResponseForbidden("You do not have access to this file.")
+    return media_response(request, name)